@@ -2,14 +2,27 @@
 
 # Author: Roberto Buelvas
 
+from collections import deque
 from datetime import datetime
+import ctypes
 import threading
+import time
 import os
+import queue
 
 import numpy as np
 import cv2
 import wx
 
+from .fast_pixops import shrinkToRgb, splitMirror
+from .video_writers import createVideoWriter
+from .file_names import nextFileNumber
+
+try:
+    from .gl_display import FrameCanvas
+except ImportError:
+    FrameCanvas = None
+
 
 class CameraHandler:
     """ Class to use cameras
@@ -21,12 +34,49 @@ class CameraHandler:
         width (int): Width in pixels of pictures taken by camera
         height (int): Heigt in pixels of pictures taken by camera
         fps (float): Frames per second taken by camera
+        band_height (int): Height in pixels of the top band of the frame where text is
+            drawn
+        glyphs (dict): Keys are the characters used in timestamps. Values are tuples
+            (sprite, advance) as returned by renderText()
+        rec_sprite (np.ndarray): 'Recording' text already rendered
+        rec_sprite_mirrored (np.ndarray): rec_sprite flipped horizontally
+        ts_text (str): HH:MM:SS part of the last timestamp drawn
+        ts_sprite (np.ndarray): ts_text already rendered
+        ts_advance (int): Width in pixels of ts_text
+        last_second (int): Unix time in seconds of the last timestamp
+        last_timestamp (str): Last timestamp in HH:MM:SS format
         is_recording (boolean): Flag to indicate if current frame should be stored as
             video file. If False, the video is just displayed
         cap (cv2.VideoCapture): Device that actually reads the video
-        video_out (cv2.VideoWriter): Object that saves frames into video file
+        video_out (PyAVWriter, NvencWriter or cv2.VideoWriter): Object that saves
+            frames into video file
         text_out (file stream): Object that saves frames into video file
+        write_queue (queue.Queue): Frames with their timestamps waiting to be saved.
+            It holds at most 2 of them; the oldest one is dropped when full
+        writer_thread (threading.Thread): Thread that encodes frames from write_queue
+            so that encoding never blocks the thread that records
+        dropped_writes (int): Number of frames dropped from write_queue because the
+            encoder was falling behind
         camera_thread (threading.Thread): Creates new thread to focus on cameras only
+        capture_thread (threading.Thread): Thread that reads frames from cap so that
+            no other thread has to wait for the camera. Only used if the camera is not
+            read by a StereoCapture object
+        is_capturing (bool): Flag to indicate when capture_thread should end
+        frame_event (threading.Event): Set every time a new frame is available, so
+            that preview() can wait for it
+        record_buffers (deque<np.ndarray>): Preallocated frames that can be passed to
+            record(). They return here once the writer thread is done with them
+        buffers (list<np.ndarray>): 3 preallocated frames used for triple buffering.
+            capture_thread writes into one, the consumer owns another and the last
+            one is either in ready or in free
+        back (int): Index of the buffer being written by capture_thread
+        front (int): Index of the buffer being read by the consumer
+        ready (deque<tuple>): (frame_count, index) of complete frames not read yet
+        free (deque<int>): Indices of buffers that capture_thread can write into.
+            Appending and popping from a deque is atomic, so ready and free let both
+            threads exchange buffers without a lock
+        frame_count (int): Number of frames captured since connecting. Only written
+            by capture_thread
     """
 
     def __init__(self, label, width=640, height=480, fps=15):
@@ -35,105 +85,436 @@ class CameraHandler:
         self.width = width
         self.height = height
         self.fps = fps
+        self.band_height = 40
+        self.glyphs = {
+            character: self.renderText(character) for character in "0123456789:."
+        }
+        self.rec_sprite = self.renderText("Recording")[0]
+        self.rec_sprite_mirrored = np.ascontiguousarray(self.rec_sprite[:, ::-1])
+        self.ts_text = ""
+        self.ts_sprite = None
+        self.ts_advance = 0
+        self.last_second = -1
+        self.last_timestamp = ""
         self.is_recording = False
+        self.is_capturing = False
+        self.frame_event = threading.Event()
         self.reset()
 
     def connect(self, camera_index):
-        """ Define cap and out attributes """
-        root_name = "data/HTPP" + datetime.now().strftime("%Y-%m-%d") + self.label[1]
-        i = 1
-        while os.path.isfile(root_name + str(i) + ".mp4"):
-            i += 1
-        final_name = root_name + str(i) + ".mp4"
-        final_text_name = root_name + str(i) + ".txt"
+        """ Define cap attribute and buffers
+
+        The output files are only created once recording starts
+        """
         self.cap = cv2.VideoCapture(camera_index, cv2.CAP_DSHOW)
+        # Most webcams deliver MJPG natively, which needs far less USB bandwidth than
+        # uncompressed frames. Cameras that don't support it ignore the setting
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
         self.cap.set(cv2.CAP_PROP_FPS, self.fps)
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        self.video_out = cv2.VideoWriter(
-            final_name, fourcc, self.fps, (self.width, self.height)
-        )
+        # Keep a single frame queued in the driver so that reads never return stale
+        # frames after the UI stalls
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.buffers = [
+            np.empty((self.height, self.width, 3), np.uint8) for i in range(3)
+        ]
+        self.back, self.front = 0, 1
+        self.ready = deque()
+        self.free = deque([2])
+        self.frame_count = 0
+        if self.is_recording:
+            self.openOutput()
+
+    def openOutput(self):
+        """ Create the video and text files, and the thread that writes them
+
+        The file name uses the date and time when recording first starts. Pausing
+        and resuming keeps writing to the same files until disconnecting
+        """
+        prefix = "HTPP" + datetime.now().strftime("%Y-%m-%d") + self.label[1]
+        root_name = "data/" + prefix
+        i = nextFileNumber("data", prefix)
+        final_name = root_name + str(i)
+        final_text_name = root_name + str(i) + ".txt"
+        self.video_out = createVideoWriter(final_name, self.fps, self.width, self.height)
         self.text_out = open(final_text_name, "w")
+        # One being filled, 2 queued and one being encoded
+        self.record_buffers = deque(
+            np.empty((self.height, self.width, 3), np.uint8) for i in range(4)
+        )
+        self.write_queue = queue.Queue(maxsize=2)
+        self.writer_thread = threading.Thread(
+            target=self.writeFrames, name="writer-" + self.label, daemon=True
+        )
+        self.writer_thread.start()
+
+    def startCapture(self):
+        """ Start a capture thread dedicated to this camera
+
+        Not needed when the camera is read by a StereoCapture object
+        """
+        self.is_capturing = True
+        self.capture_thread = threading.Thread(
+            target=self.capture, name="cap-" + self.label, daemon=True
+        )
+        self.capture_thread.start()
+
+    def capture(self):
+        """ Read frames from the camera as soon as they are available
+
+        Target function of capture_thread. cap.grab() blocks until the camera delivers
+        a frame, so doing it here keeps that wait away from the UI.
+        The loop ends when the camera stops delivering frames
+        """
+        pinCurrentThread()
+        while self.is_capturing:
+            if not (self.cap.grab() and self.retrieve()):
+                break
+
+    def retrieve(self):
+        """ Decode the frame latched by cap.grab() and publish it
+
+        The frame is written into the back buffer, which is then moved to ready, and
+        frame_event is set. Returns True if a frame was published
+        """
+        ret, frame = self.cap.retrieve(self.buffers[self.back])
+        if ret:
+            # cap.retrieve() allocates a new array if the camera ignored the size
+            self.buffers[self.back] = frame
+            self.frame_count += 1
+            self.ready.append((self.frame_count, self.back))
+            self.back = self.takeFreeBuffer()
+            self.frame_event.set()
+        return ret
+
+    def takeFreeBuffer(self):
+        """ Get a buffer for capture_thread to write the next frame into
+
+        If the consumer has not read the oldest frame in ready, that frame is dropped
+        and its buffer reused. Both deques can only be empty for an instant, while the
+        consumer is exchanging its buffer
+        """
+        while True:
+            try:
+                return self.free.popleft()
+            except IndexError:
+                pass
+            try:
+                return self.ready.popleft()[1]
+            except IndexError:
+                time.sleep(0)
+
+    def latestFrame(self, last_count):
+        """ Get the newest frame captured
+
+        Args:
+            last_count (int): frame_count of the last frame received by the caller
+        Return:
+            frame_count (int): Number of the frame returned
+            frame (np.ndarray or None): Newest frame, or None if there is no new frame
+                since last_count. It remains valid until the next call
+        """
+        try:
+            frame_count, index = self.ready.pop()
+        except IndexError:
+            return last_count, None
+        self.free.append(self.front)
+        self.front = index
+        if frame_count <= last_count:
+            # Older frame left behind when a newer one was read first
+            return last_count, None
+        return frame_count, self.buffers[index]
 
     def startRecording(self, new_thread=False):
         """ 
         If new_thread is True, create a new thread (assuming a previous one doesn't
         exist already) and start its operation. If False, just set is_recording flag to
-        True 
+        True. The output files are created the first time this is called after
+        connecting
         """
+        if self.cap is not None and self.video_out is None:
+            self.openOutput()
         self.is_recording = True
         if new_thread and self.camera_thread is None:
+            if self.capture_thread is None:
+                self.startCapture()
             self.camera_thread = threading.Thread(target=self.preview, daemon=True)
             self.camera_thread.start()
 
     def preview(self):
-        """ Use cv2.imshow() to display video from cameras
-        
+        """ Record video from camera without displaying it
+
         When is_recording is True, store video as video file. Add timestamp to it.
-        Used for debugging
+        Displaying is left to CameraPanel. The thread sleeps until a new frame
+        arrives, and only the most recent frame is used; frames that arrive while
+        the previous one is being handled are skipped rather than queued. The loop
+        ends when disconnecting. Used for debugging
         """
-        while self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if ret:
-                frame = cv2.flip(frame, 1).copy()
-                timestamp = datetime.now().strftime("%H:%M:%S")
-                timed_frame = frame.copy()
-                if self.is_recording:
-                    cv2.putText(
-                        timed_frame,
-                        timestamp,
-                        (0, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        1,
-                        (255, 255, 255),
-                        3,
-                        cv2.LINE_AA,
-                        False,
-                    )
-                    self.video_out.write(timed_frame)
-                    self.text_out.write(timestamp + "\n")
-                    cv2.putText(
-                        frame,
-                        "Recording",
-                        (450, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        1,
-                        (255, 255, 255),
-                        3,
-                        cv2.LINE_AA,
-                        False,
-                    )
-                cv2.imshow(self.label, frame)
-                if cv2.waitKey(1) == ord("q"):
-                    break
-            else:
+        frame_count = 0
+        while self.is_capturing:
+            self.frame_event.wait()
+            self.frame_event.clear()
+            frame_count, frame = self.latestFrame(frame_count)
+            if frame is not None and self.is_recording:
+                timed_frame = cv2.flip(frame, 1, dst=self.takeRecordBuffer())
+                self.record(timed_frame, self.getTimestamp())
+
+    def record(self, frame, timestamp):
+        """ Queue frame with timestamp to be saved into video file
+
+        The timestamp is drawn directly on frame, without copying it. frame then
+        belongs to the writer thread, so the caller must not use it afterwards. It
+        should come from takeRecordBuffer() so that it is reused later. If the encoder
+        is falling behind, the oldest queued frame is dropped instead of blocking
+        """
+        self.drawTimestamp(frame, timestamp)
+        while True:
+            try:
+                self.write_queue.put_nowait((frame, timestamp))
                 break
+            except queue.Full:
+                try:
+                    self.record_buffers.append(self.write_queue.get_nowait()[0])
+                    self.dropped_writes += 1
+                except queue.Empty:
+                    pass
+
+    def takeRecordBuffer(self):
+        """ Get a preallocated frame to fill and then pass to record() """
+        try:
+            return self.record_buffers.popleft()
+        except IndexError:
+            # Only if the writer thread is holding all of them
+            return np.empty((self.height, self.width, 3), np.uint8)
+
+    def writeFrames(self):
+        """ Save queued frames into the video and text files
+
+        Target function of writer_thread. It ends when None is queued
+        """
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            timed_frame, timestamp = item
+            self.video_out.write(timed_frame)
+            self.text_out.write(timestamp + "\n")
+            self.record_buffers.append(timed_frame)
+
+    def getTimestamp(self, with_microseconds=False):
+        """ Return the current time in HH:MM:SS format
+
+        The string is only formatted again when the second changes, which avoids
+        creating a datetime and calling strftime for every frame
+        If with_microseconds is True, the format is HH:MM:SS.ffffff
+        """
+        now = time.time()
+        second = int(now)
+        if second != self.last_second:
+            self.last_second = second
+            self.last_timestamp = time.strftime("%H:%M:%S", time.localtime(second))
+        if with_microseconds:
+            return self.last_timestamp + ".%06d" % int((now - second) * 1000000)
+        return self.last_timestamp
+
+    def drawTimestamp(self, frame, timestamp):
+        """ Draw timestamp on the top left corner of frame
+
+        The HH:MM:SS part only changes once per second, so it is rendered into
+        ts_sprite once and reused. Any characters after it (e.g. microseconds) are
+        drawn one glyph at a time
+        """
+        if timestamp[:8] != self.ts_text:
+            self.ts_text = timestamp[:8]
+            self.ts_advance = 0
+            self.ts_sprite = np.zeros((self.band_height, 200, 3), np.uint8)
+            for character in self.ts_text:
+                glyph, advance = self.glyphs[character]
+                self.blit(self.ts_sprite, self.ts_advance, glyph)
+                self.ts_advance += advance
+        self.blit(frame, 0, self.ts_sprite)
+        x = self.ts_advance
+        for character in timestamp[8:]:
+            glyph, advance = self.glyphs[character]
+            self.blit(frame, x, glyph)
+            x += advance
+
+    def drawRecordingLabel(self, frame, mirrored=False):
+        """ Draw 'Recording' on the frame that is displayed
+
+        If mirrored is True, the label is drawn flipped and on the opposite side, so
+        that it reads correctly once the whole frame is flipped for display
+        """
+        if mirrored:
+            x = frame.shape[1] - 450 - self.rec_sprite.shape[1]
+            self.blit(frame, x, self.rec_sprite_mirrored)
+        else:
+            self.blit(frame, 450, self.rec_sprite)
+
+    def renderText(self, text):
+        """ Draw text once with cv2.putText() so that it can be blitted later
+
+        Return:
+            sprite (np.ndarray): White text over black background. Its height is
+                band_height and the text baseline is at row 30
+            advance (int): Horizontal distance in pixels to where the next text
+                should start
+        """
+        width = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 1, 3)[0][0]
+        double_width = cv2.getTextSize(text * 2, cv2.FONT_HERSHEY_SIMPLEX, 1, 3)[0][0]
+        sprite = np.zeros((self.band_height, width + 3, 3), np.uint8)
+        cv2.putText(
+            sprite,
+            text,
+            (0, 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1,
+            (255, 255, 255),
+            3,
+            cv2.LINE_AA,
+            False,
+        )
+        return sprite, double_width - width
+
+    def blit(self, frame, x, sprite):
+        """ Draw sprite on the top band of frame starting at column x
+
+        The text is white, so keeping the brightest value of each pixel blends the
+        antialiased edges with the background. That is much cheaper than rasterizing
+        the text again with cv2.putText()
+        """
+        width = min(sprite.shape[1], frame.shape[1] - x)
+        # Frames smaller than requested may not have room for the whole sprite
+        if width <= 0:
+            return
+        height = min(sprite.shape[0], frame.shape[0])
+        roi = frame[:height, x : x + width]
+        np.maximum(roi, sprite[:height, :width], out=roi)
 
     def stopRecording(self):
         """ Video is no longer saved in file, but it is still displayed """
         self.is_recording = False
 
     def disconnect(self):
-        """ Release and destroy cap, out and camera_thread attributes """
+        """ Release and destroy cap, out and camera_thread attributes
+
+        Returns the number of frames that could not be saved
+        """
         self.stopRecording()
+        self.is_capturing = False
+        # Wake up preview() so that it sees is_capturing
+        self.frame_event.set()
+        if self.capture_thread is not None:
+            self.capture_thread.join()
+        # record() may drop the oldest queued item, so nothing else may be queued
+        # once the end of write_queue is signalled
+        if self.camera_thread is not None:
+            self.camera_thread.join()
         if self.cap is not None:
             self.cap.release()
+        if self.writer_thread is not None:
+            # put() waits for space, so the frames already queued are still saved
+            self.write_queue.put(None)
+            self.writer_thread.join()
         if self.video_out is not None:
             self.video_out.release()
         if self.text_out is not None:
             self.text_out.close()
-        cv2.destroyAllWindows()
-        if self.camera_thread is not None:
-            self.camera_thread.join()
+        dropped_writes = self.dropped_writes
         self.reset()
+        return dropped_writes
 
     def reset(self):
         """ Set attributes to None to be ready to redefine them """
         self.cap = None
         self.video_out = None
         self.text_out = None
+        self.write_queue = None
+        self.writer_thread = None
+        self.dropped_writes = 0
         self.camera_thread = None
+        self.capture_thread = None
+        self.buffers = None
+        self.ready = None
+        self.free = None
+        self.record_buffers = None
+        self.frame_count = 0
+
+
+def pinCurrentThread():
+    """ Run the calling thread only on the last CPU core
+
+    The UI usually runs on the first cores, so capture threads pinned to the last one
+    are not delayed by it. Nothing is done if the system does not allow pinning
+    """
+    cpu = os.cpu_count() - 1
+    if cpu < 1:
+        return
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            # On Linux, pid 0 refers to the calling thread only
+            os.sched_setaffinity(0, {cpu})
+        elif os.name == "nt":
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), 1 << cpu)
+    except OSError as e:
+        print("Could not pin capture thread")
+        print(str(e))
+
+
+class StereoCapture:
+    """ Read frames from several cameras in a single thread
+
+    Every camera grabs a frame before any of them retrieves it. grab() only latches
+    the frame, while retrieve() decodes it, so the frames of the left and right
+    cameras are taken almost at the same time and the UI never waits for either
+
+    Attr:
+        cameras (list<CameraHandler>): Connected cameras to read from
+        frame_callback (function or None): Called without arguments once all
+            cameras have delivered their frames
+        is_capturing (bool): Flag to indicate when thread should end
+        thread (threading.Thread): Thread that reads from all cameras
+    """
+
+    def __init__(self, cameras, frame_callback=None):
+        """ Initialize attributes """
+        self.cameras = cameras
+        self.frame_callback = frame_callback
+        self.is_capturing = False
+        self.thread = None
+
+    def start(self):
+        """ Start reading from cameras in a new thread """
+        self.is_capturing = True
+        self.thread = threading.Thread(
+            target=self.capture, name="cap-stereo", daemon=True
+        )
+        self.thread.start()
+
+    def capture(self):
+        """ Grab from all cameras, then retrieve from all of them
+
+        Target function of thread. The loop ends when no camera delivers frames
+        """
+        pinCurrentThread()
+        while self.is_capturing:
+            grabbed = [camera.cap.grab() for camera in self.cameras]
+            if not any(grabbed):
+                break
+            for camera, is_grabbed in zip(self.cameras, grabbed):
+                if is_grabbed:
+                    camera.retrieve()
+            if self.frame_callback is not None:
+                self.frame_callback()
+
+    def stop(self):
+        """ End the thread """
+        self.is_capturing = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
 
 
 class CameraPanel(wx.Panel):
@@ -141,37 +522,89 @@ class CameraPanel(wx.Panel):
     
     Attr:
         camera (CameraHandler): Camera object to embed
-        timer (wx.Timer): Used to update frames periodically
+        rgb (np.ndarray): Buffer reused every frame to hold the RGB version of it,
+            at the size of the panel but at most shrunk by preview_shrink. It is
+            scaled to fill the panel when painting
         bmp (wx.Bitmap): Actual image displayed on panel
+        frame_count (int): Number of the last frame displayed
+        dropped_frames (int): Number of frames captured but never displayed because a
+            newer one was already available. Printed when disconnecting
+        label_font (wx.Font): Font of the 'Recording' label, created only once
+        is_bmp_stale (bool): Indicate if rgb holds a frame not yet copied into bmp
+        canvas (FrameCanvas or None): OpenGL canvas covering the panel. If OpenGL is
+            available, frames are shown there instead of through rgb and bmp
+        preview_shrink (int): Minimum factor by which the preview is smaller than the
+            camera resolution. Recorded video always keeps the full resolution
     """
 
+    preview_shrink = 2
+
     def __init__(self, parent, label):
         """ Initialize attributes """
         wx.Panel.__init__(self, parent)
         self.camera = CameraHandler(label)
-        self.timer = wx.Timer(self, wx.Window.NewControlId())
         self.Bind(wx.EVT_PAINT, self.OnPaint)
-        self.Bind(wx.EVT_TIMER, self.NextFrame, id=self.timer.GetId())
+        self.Bind(wx.EVT_SIZE, self.OnSize)
+        self.rgb = None
         self.bmp = None
+        self.frame_count = 0
+        self.dropped_frames = 0
+        self.label_font = wx.Font(wx.FontInfo(20).Bold())
+        self.is_bmp_stale = False
+        self.canvas = None
 
     def connect(self, camera_index):
         """ Connect camera handler
         
-        Get a first frame and populate bmp based on it
-        Start timer
+        Populate bmp with a black image until the first frame arrives
         """
         self.camera.connect(camera_index)
-        ret, frame = self.camera.cap.read()
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        self.bmp = wx.Bitmap.FromBuffer(self.camera.width, self.camera.height, frame)
+        self.frame_count = 0
+        self.dropped_frames = 0
+        if FrameCanvas is not None:
+            self.canvas = FrameCanvas(self, self.camera.width, self.camera.height)
+            sizer = wx.BoxSizer()
+            sizer.Add(self.canvas, proportion=1, flag=wx.EXPAND)
+            self.SetSizer(sizer)
+            self.Layout()
+        self.allocateDisplay()
         self.Refresh()
-        self.timer.Start(1000.0 / self.camera.fps)
+
+    def allocateDisplay(self):
+        """ Create rgb and bmp to match the size of the panel
+
+        They are not recreated if the size didn't change
+        """
+        width, height = self.GetClientSize()
+        width = max(1, min(width, self.camera.width // self.preview_shrink))
+        height = max(1, min(height, self.camera.height // self.preview_shrink))
+        if self.rgb is not None and self.rgb.shape[:2] == (height, width):
+            return
+        self.rgb = np.zeros((height, width, 3), np.uint8)
+        self.bmp = wx.Bitmap.FromBuffer(width, height, self.rgb)
+        self.is_bmp_stale = False
 
     def disconnect(self):
         """ Stop video """
-        self.timer.Stop()
-        self.camera.disconnect()
+        dropped_writes = self.camera.disconnect()
+        if self.dropped_frames > 0 or dropped_writes > 0:
+            print(
+                self.camera.label
+                + ": "
+                + str(self.dropped_frames)
+                + " of "
+                + str(self.frame_count)
+                + " frames dropped, "
+                + str(dropped_writes)
+                + " frames not saved"
+            )
+        self.rgb = None
         self.bmp = None
+        if self.canvas is not None:
+            self.canvas.release()
+            self.canvas.Destroy()
+            self.SetSizer(None)
+            self.canvas = None
 
     def pauseRecording(self):
         """ Video is no longer saved as video file, but it is still displayed """
@@ -181,48 +614,82 @@ class CameraPanel(wx.Panel):
         """ (Re)starts saving video as file """
         self.camera.startRecording()
 
+    def OnSize(self, event):
+        """ Resize the display buffers along with the panel """
+        event.Skip()
+        if self.bmp is not None:
+            self.allocateDisplay()
+            self.Refresh()
+
     def OnPaint(self, event):
-        """ Responds to Refresh() by updating bmp """
+        """ Responds to Refresh() by updating bmp
+
+        The bitmap is drawn mirrored and stretched to the size of the panel, which is
+        cheaper than flipping and resizing the pixels of every frame. rgb is copied
+        into bmp here rather than in NextFrame because several Refresh() calls can be
+        merged into a single paint event, so frames that are never painted are never
+        copied either
+        """
         dc = wx.BufferedPaintDC(self)
         if self.bmp is not None:
-            dc.DrawBitmap(self.bmp, 0, 0)
-
-    def NextFrame(self, event):
-        """ Responds to timer by getting next frame """
-        if self.camera.cap.isOpened():
-            ret, frame = self.camera.cap.read()
-            if ret:
-                frame = cv2.flip(frame, 1)
-                timestamp = datetime.now().strftime("%H:%M:%S.%f")
-                timed_frame = frame.copy()
-                if self.camera.is_recording:
-                    cv2.putText(
-                        timed_frame,
-                        timestamp,
-                        (0, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        1,
-                        (255, 255, 255),
-                        3,
-                        cv2.LINE_AA,
-                        False,
-                    )
-                    self.camera.video_out.write(timed_frame)
-                    self.camera.text_out.write(timestamp + "\n")
-                    cv2.putText(
-                        frame,
-                        "Recording",
-                        (450, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        1,
-                        (255, 255, 255),
-                        3,
-                        cv2.LINE_AA,
-                        False,
-                    )
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                self.bmp.CopyFromBuffer(frame)
-                self.Refresh()
+            if self.is_bmp_stale:
+                self.bmp.CopyFromBuffer(self.rgb)
+                self.is_bmp_stale = False
+            width, height = self.GetClientSize()
+            gc = wx.GraphicsContext.Create(dc)
+            gc.PushState()
+            gc.Translate(width, 0)
+            gc.Scale(-1, 1)
+            gc.DrawBitmap(self.bmp, 0, 0, width, height)
+            gc.PopState()
+            if self.camera.is_recording:
+                gc.SetFont(self.label_font, wx.WHITE)
+                gc.DrawText("Recording", 450, 5)
+
+    def NextFrame(self):
+        """ Display the newest frame and record it if needed
+
+        Frames are taken from the thread of StereoCapture, so this never waits
+        for the camera. It always gets the most recent frame, never a queued one,
+        because the driver buffer holds a single frame and older unread frames are
+        dropped. Nothing is done if no new frame arrived since the last call or if
+        the camera was disconnected in the meantime. While the panel is not visible,
+        frames are only recorded. Called by CameraFrame.NextFrame()
+        """
+        if self.bmp is None:
+            return
+        last_count = self.frame_count
+        self.frame_count, frame = self.camera.latestFrame(last_count)
+        if frame is None:
+            return
+        self.dropped_frames += self.frame_count - last_count - 1
+        if not self.IsShownOnScreen():
+            # Minimized or hidden, so only the recording needs the frame
+            if self.camera.is_recording:
+                self.recordFrame(frame)
+        elif self.canvas is not None:
+            # The frame is owned by this thread until the next call to latestFrame()
+            if self.camera.is_recording:
+                self.recordFrame(frame)
+                self.camera.drawRecordingLabel(frame, mirrored=True)
+            self.canvas.showFrame(frame)
+        else:
+            if self.camera.is_recording:
+                # Only the recorded video is flipped here. The display is flipped
+                # when painting
+                flipped = splitMirror(frame, self.rgb, self.camera.takeRecordBuffer())
+                timestamp = self.camera.getTimestamp(with_microseconds=True)
+                self.camera.record(flipped, timestamp)
+            else:
+                shrinkToRgb(frame, self.rgb)
+            self.is_bmp_stale = True
+            self.Refresh()
+
+    def recordFrame(self, frame):
+        """ Flip frame into a buffer of the camera and record it """
+        flipped = cv2.flip(frame, 1, dst=self.camera.takeRecordBuffer())
+        timestamp = self.camera.getTimestamp(with_microseconds=True)
+        self.camera.record(flipped, timestamp)
 
 
 class CameraFrame(wx.Frame):
@@ -234,6 +701,9 @@ class CameraFrame(wx.Frame):
             side. If any side doesn't have any camera, use None
         camL (CameraPanel): Panel showing video from left camera
         camR (CameraPanel): Panel showing video from right camera
+        stereo_capture (StereoCapture): Reads from both cameras while connected
+        is_frame_pending (bool): Indicate if NextFrame has already been scheduled but
+            hasn't run yet
     """
 
     def __init__(self, parent, camera_ports):
@@ -242,6 +712,8 @@ class CameraFrame(wx.Frame):
         Destroy itself if no camera ports are available
         """
         wx.Frame.__init__(self, parent=parent, title="Camera frame")
+        self.stereo_capture = None
+        self.is_frame_pending = False
         if (camera_ports[0] is not None) or (camera_ports[1] is not None):
             self.camera_ports = camera_ports
             self.InitUI(parent)
@@ -303,12 +775,18 @@ class CameraFrame(wx.Frame):
         is_pressed = btn.GetValue()
         if is_pressed:
             btn.SetLabelText("Disconnect")
+            cameras = []
             if self.camL is not None:
                 self.camL.connect(self.camera_ports[0])
+                cameras.append(self.camL.camera)
             if self.camR is not None:
                 self.camR.connect(self.camera_ports[1])
+                cameras.append(self.camR.camera)
+            self.stereo_capture = StereoCapture(cameras, self.OnFrameReady)
+            self.stereo_capture.start()
         else:
             btn.SetLabelText("Connect")
+            self.stopCapture()
             if self.camL is not None:
                 self.camL.disconnect()
             if self.camR is not None:
@@ -333,6 +811,7 @@ class CameraFrame(wx.Frame):
 
     def close(self):
         """ Safely close frame by disconnecting from cameras first """
+        self.stopCapture()
         if self.camL is not None:
             self.camL.pauseRecording()
             self.camL.disconnect()
@@ -341,6 +820,30 @@ class CameraFrame(wx.Frame):
             self.camR.disconnect()
         self.DestroyLater()
 
+    def OnFrameReady(self):
+        """ Schedule NextFrame in the UI thread
+
+        Called from the thread of stereo_capture once both cameras have a new frame,
+        so both panels are updated with a single call instead of one each
+        """
+        if not self.is_frame_pending:
+            self.is_frame_pending = True
+            wx.CallAfter(self.NextFrame)
+
+    def NextFrame(self):
+        """ Update both panels """
+        self.is_frame_pending = False
+        if self.camL is not None:
+            self.camL.NextFrame()
+        if self.camR is not None:
+            self.camR.NextFrame()
+
+    def stopCapture(self):
+        """ Stop reading from cameras, if it was being done """
+        if self.stereo_capture is not None:
+            self.stereo_capture.stop()
+            self.stereo_capture = None
+
 
 # For debugging
 if __name__ == "__main__":
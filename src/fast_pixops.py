@@ -0,0 +1,80 @@
+""" Pixel operations on camera frames that are faster than chaining OpenCV calls """
+
+# Author: Roberto Buelvas
+
+import cv2
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _splitMirror(src, rgb, flipped):
+    """ Shrink src to RGB and mirror it horizontally in a single pass
+
+    Each pixel of src is read once. Every 2x2 block is averaged into one pixel of
+    rgb, while the 4 pixels are also written mirrored into flipped
+
+    Args:
+        src (np.ndarray): BGR frame
+        rgb (np.ndarray): Output with half the width and height of src, in RGB order
+        flipped (np.ndarray): Output with src mirrored horizontally, still in BGR
+    """
+    height, width = rgb.shape[:2]
+    last = src.shape[1] - 1
+    for y in numba.prange(height):
+        for x in range(width):
+            for c in range(3):
+                p00 = src[2 * y, 2 * x, c]
+                p01 = src[2 * y, 2 * x + 1, c]
+                p10 = src[2 * y + 1, 2 * x, c]
+                p11 = src[2 * y + 1, 2 * x + 1, c]
+                flipped[2 * y, last - 2 * x, c] = p00
+                flipped[2 * y, last - 2 * x - 1, c] = p01
+                flipped[2 * y + 1, last - 2 * x, c] = p10
+                flipped[2 * y + 1, last - 2 * x - 1, c] = p11
+                total = np.int32(p00) + np.int32(p01) + np.int32(p10) + np.int32(p11)
+                rgb[y, x, 2 - c] = (total + 2) // 4
+
+
+if numba is not None:
+    # nogil lets the capture and writer threads run while the kernel works
+    _splitMirror = numba.njit(cache=True, parallel=True, nogil=True)(_splitMirror)
+
+
+def shrinkToRgb(src, rgb):
+    """ Resize a BGR frame to the size of rgb and convert it to RGB
+
+    Both steps write into rgb, so no intermediate buffer is needed
+    """
+    size = (rgb.shape[1], rgb.shape[0])
+    cv2.resize(src, size, dst=rgb, interpolation=cv2.INTER_AREA)
+    cv2.cvtColor(rgb, cv2.COLOR_BGR2RGB, dst=rgb)
+    return rgb
+
+
+def splitMirror(src, rgb, flipped):
+    """ Produce both the shrunk RGB version of a frame and its mirrored BGR version
+
+    Uses a compiled kernel if numba is installed, which runs without holding the
+    GIL. Otherwise, it falls back to OpenCV calls, which read src twice
+
+    Args:
+        src (np.ndarray): BGR frame
+        rgb (np.ndarray): Preallocated output for the RGB frame. The compiled
+            kernel is only used if it has half the width and height of src
+        flipped (np.ndarray): Preallocated output for the mirrored BGR frame
+    Return:
+        flipped (np.ndarray): Mirrored BGR frame. It is the same array as the argument
+            unless its shape doesn't match src, in which case OpenCV allocates a new
+            one
+    """
+    is_half = 2 * rgb.shape[0] == src.shape[0] and 2 * rgb.shape[1] == src.shape[1]
+    if numba is not None and is_half and src.shape == flipped.shape:
+        _splitMirror(src, rgb, flipped)
+    else:
+        shrinkToRgb(src, rgb)
+        flipped = cv2.flip(src, 1, dst=flipped)
+    return flipped
@@ -0,0 +1,24 @@
+""" Choose names for output files in the data folder """
+
+# Author: Roberto Buelvas
+
+import os
+import re
+
+
+def nextFileNumber(folder, prefix):
+    """ Find the number to append to prefix so that no file gets overwritten
+
+    The folder is listed only once instead of checking numbers one by one. Only text
+    files are checked, because the video extension depends on the encoder. Returns 1
+    if the folder doesn't exist
+    """
+    pattern = re.compile(re.escape(prefix) + r"(\d+)\.txt$")
+    used = [0]
+    if os.path.isdir(folder):
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                match = pattern.match(entry.name)
+                if match is not None:
+                    used.append(int(match.group(1)))
+    return max(used) + 1
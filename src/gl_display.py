@@ -0,0 +1,115 @@
+""" Display camera frames with OpenGL """
+
+# Author: Roberto Buelvas
+
+import wx
+from wx import glcanvas
+from OpenGL import GL
+
+
+class FrameCanvas(glcanvas.GLCanvas):
+    """ Show camera frames as an OpenGL texture
+
+    Frames are uploaded in BGR order, so no color conversion is done on the CPU. The
+    texture is drawn mirrored and stretched to the size of the canvas by the GPU,
+    and SwapBuffers() waits for the vertical sync of the screen
+
+    Attr:
+        context (glcanvas.GLContext): OpenGL context of the canvas
+        width (int): Width in pixels of frames
+        height (int): Height in pixels of frames
+        texture (int or None): Name of the OpenGL texture holding the last frame
+    """
+
+    def __init__(self, parent, width, height):
+        """ Initialize attributes """
+        glcanvas.GLCanvas.__init__(self, parent, size=(width, height))
+        self.context = glcanvas.GLContext(self)
+        self.width = width
+        self.height = height
+        self.texture = None
+        self.Bind(wx.EVT_PAINT, self.OnPaint)
+        # Erasing the background would make the canvas flicker
+        self.Bind(wx.EVT_ERASE_BACKGROUND, lambda event: None)
+
+    def createTexture(self):
+        """ Allocate the texture once, so that frames only need to be copied into it """
+        self.texture = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+        GL.glTexImage2D(
+            GL.GL_TEXTURE_2D,
+            0,
+            GL.GL_RGB,
+            self.width,
+            self.height,
+            0,
+            GL.GL_BGR,
+            GL.GL_UNSIGNED_BYTE,
+            None,
+        )
+
+    def showFrame(self, frame):
+        """ Copy BGR frame into the texture and schedule a repaint
+
+        The texture is allocated again if the frame size differs from the requested
+        one, which happens with cameras that do not honour the requested resolution
+        """
+        height, width = frame.shape[:2]
+        if (width, height) != (self.width, self.height):
+            self.release()
+            self.width = width
+            self.height = height
+        self.SetCurrent(self.context)
+        if self.texture is None:
+            self.createTexture()
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
+        GL.glTexSubImage2D(
+            GL.GL_TEXTURE_2D,
+            0,
+            0,
+            0,
+            self.width,
+            self.height,
+            GL.GL_BGR,
+            GL.GL_UNSIGNED_BYTE,
+            frame,
+        )
+        self.Refresh(False)
+
+    def OnPaint(self, event):
+        """ Draw the texture as a quad covering the whole canvas
+
+        The texture coordinates are swapped horizontally to mirror the frame, and
+        vertically because the first row of a frame is the top one
+        """
+        wx.PaintDC(self)
+        self.SetCurrent(self.context)
+        scale = self.GetContentScaleFactor()
+        width, height = self.GetClientSize()
+        GL.glViewport(0, 0, int(width * scale), int(height * scale))
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT)
+        if self.texture is not None:
+            GL.glEnable(GL.GL_TEXTURE_2D)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
+            GL.glBegin(GL.GL_QUADS)
+            for u, v, x, y in (
+                (1, 1, -1, -1),
+                (0, 1, 1, -1),
+                (0, 0, 1, 1),
+                (1, 0, -1, 1),
+            ):
+                GL.glTexCoord2f(u, v)
+                GL.glVertex2f(x, y)
+            GL.glEnd()
+            GL.glDisable(GL.GL_TEXTURE_2D)
+        self.SwapBuffers()
+
+    def release(self):
+        """ Free the texture before the canvas is destroyed """
+        if self.texture is not None:
+            self.SetCurrent(self.context)
+            GL.glDeleteTextures([self.texture])
+            self.texture = None
@@ -42,6 +42,9 @@ class LayoutDialog(wx.Dialog):
     in this dialog
     """
 
+    # Schematic image, loaded and rescaled only the first time the dialog opens
+    diagram_bitmap = None
+
     def __init__(self, parent, settings, *args, **kw):
         """ Create new dialog """
         super(LayoutDialog, self).__init__(parent, *args, **kw)
@@ -57,6 +60,8 @@ class LayoutDialog(wx.Dialog):
 
         vbox0 = wx.BoxSizer(wx.VERTICAL)
         pnl = ScrolledPanel(self)
+        # Avoid repainting after every control is added
+        self.Freeze()
         vbox1 = wx.BoxSizer(wx.VERTICAL)
 
         st = wx.StaticText(
@@ -69,8 +74,10 @@ class LayoutDialog(wx.Dialog):
         st.SetFont(wx.Font(18, wx.DEFAULT, wx.NORMAL, wx.NORMAL))
         vbox1.Add(st, proportion=0, flag=wx.ALL)
 
-        image = wx.Image("docs/diagram.png", wx.BITMAP_TYPE_ANY).Rescale(450, 300)
-        imageBitmap = wx.StaticBitmap(pnl, bitmap=wx.Bitmap(image))
+        if LayoutDialog.diagram_bitmap is None:
+            image = wx.Image("docs/diagram.png", wx.BITMAP_TYPE_ANY).Rescale(450, 300)
+            LayoutDialog.diagram_bitmap = wx.Bitmap(image)
+        imageBitmap = wx.StaticBitmap(pnl, bitmap=LayoutDialog.diagram_bitmap)
         vbox1.Add(imageBitmap, proportion=1, flag=wx.ALL | wx.CENTER)
 
         st = wx.StaticText(pnl, label="All distances in cm")
@@ -78,24 +85,23 @@ class LayoutDialog(wx.Dialog):
 
         self.setting_to_control = {}
 
-        self.addLabelledCtrl(pnl, vbox1, "DB1")
-        self.addLabelledCtrl(pnl, vbox1, "DB2")
-        for i in range(num_sensors):
-            self.addLabelledCtrl(pnl, vbox1, "DL" + str(i + 1))
-        for i in range(num_sensors):
-            self.addLabelledCtrl(pnl, vbox1, "DR" + str(i + 1))
-        if self.settings.ReadBool("connectedgL", False):
-            self.addLabelledCtrl(pnl, vbox1, "DGLX")
-            self.addLabelledCtrl(pnl, vbox1, "DGLY")
-        if self.settings.ReadBool("connectedgR", False):
-            self.addLabelledCtrl(pnl, vbox1, "DGRX")
-            self.addLabelledCtrl(pnl, vbox1, "DGRY")
-        if self.settings.ReadBool("connectedeL", False):
-            self.addLabelledCtrl(pnl, vbox1, "IEL")
-            self.addLabelledCtrl(pnl, vbox1, "DEL")
-        if self.settings.ReadBool("connectedeR", False):
-            self.addLabelledCtrl(pnl, vbox1, "IER")
-            self.addLabelledCtrl(pnl, vbox1, "DER")
+        labels = ["DB1", "DB2"]
+        labels += ["DL" + str(i + 1) for i in range(num_sensors)]
+        labels += ["DR" + str(i + 1) for i in range(num_sensors)]
+        optional_labels = {
+            "gL": ["DGLX", "DGLY"],
+            "gR": ["DGRX", "DGRY"],
+            "eL": ["IEL", "DEL"],
+            "eR": ["IER", "DER"],
+        }
+        for sensor, sensor_labels in optional_labels.items():
+            if self.settings.ReadBool("connected" + sensor, False):
+                labels += sensor_labels
+        # All settings are read before creating any control
+        self.initial_values = {label: self.readValue(label) for label in labels}
+        for label in labels:
+            initial = self.initial_values[label]
+            self.addLabelledCtrl(pnl, vbox1, label, initial, num_sensors)
 
         pnl.SetSizer(vbox1)
         pnl.SetupScrolling()
@@ -110,18 +116,26 @@ class LayoutDialog(wx.Dialog):
 
         vbox0.Add(pnl, proportion=1, flag=wx.ALL | wx.EXPAND, border=5)
         vbox0.Add(hbox, proportion=0, flag=wx.ALIGN_CENTER | wx.ALL, border=10)
+        self.Thaw()
         self.SetSizer(vbox0)
 
     def OnOK(self, e):
-        """ Save new settings and close """
-        other_settings = list(self.setting_to_control.keys())
-        for setting in other_settings:
-            ctrl = self.setting_to_control[setting]
+        """ Save new settings and close
+
+        Only settings that changed or are missing from cfg are written, and they are
+        flushed together at the end. Missing ones must be written even when left at
+        their default, e.g. the GPS offsets are only used if they exist in cfg
+        """
+        for setting, ctrl in self.setting_to_control.items():
+            value = ctrl.GetValue()
+            if self.settings.HasEntry(setting) and value == self.initial_values[setting]:
+                continue
             if setting[0] == "D":
-                self.settings.WriteFloat(setting, ctrl.GetValue())
+                self.settings.WriteFloat(setting, value)
             else:
                 if setting[0] == "I":
-                    self.settings.WriteInt(setting, ctrl.GetValue())
+                    self.settings.WriteInt(setting, value)
+        self.settings.Flush()
         self.EndModal(wx.ID_OK)
 
     def OnCancel(self, e):
@@ -136,7 +150,13 @@ class LayoutDialog(wx.Dialog):
         """ Return keys of settings modified in this dialog """
         return list(self.setting_to_control.keys())
 
-    def addLabelledCtrl(self, panel, boxSizer, label):
+    def readValue(self, label):
+        """ Read the current value of a distance or index setting """
+        if label[0] == "D":
+            return self.settings.ReadFloat(label)
+        return self.settings.ReadInt(label)
+
+    def addLabelledCtrl(self, panel, boxSizer, label, initial, num_sensors):
         """ Add a StaticText and SpinControl pair
 
         Args:
@@ -146,6 +166,9 @@ class LayoutDialog(wx.Dialog):
                             BoxSizers cannot be used as parent
             label (str): Label of the format DGLX or DL1 to help identify which
                          setting is modified by each control
+            initial (float or int): Current value of the setting
+            num_sensors (int): Number of sensor units per side. Upper limit of
+                               index settings
         Besides creating the mentioned controls, the function adds them to the
         attribute setting_to_control for later use.
         This dictionary allows to remember which setting is modified by each
@@ -156,17 +179,10 @@ class LayoutDialog(wx.Dialog):
         st = wx.StaticText(panel, label=label)
         boxSizer.Add(st, proportion=0, flag=wx.CENTER | wx.TOP, border=10)
         if label[0] == "D":
-            spinCtrl = wx.SpinCtrlDouble(
-                panel, min=-3000, max=3000, initial=self.settings.ReadFloat(label)
-            )
+            spinCtrl = wx.SpinCtrlDouble(panel, min=-3000, max=3000, initial=initial)
             spinCtrl.SetDigits(2)
         else:
             if label[0] == "I":
-                spinCtrl = wx.SpinCtrl(
-                    panel,
-                    min=1,
-                    max=self.settings.ReadInt("numSensors", 1),
-                    initial=self.settings.ReadInt(label),
-                )
+                spinCtrl = wx.SpinCtrl(panel, min=1, max=num_sensors, initial=initial)
         boxSizer.Add(spinCtrl, proportion=0, flag=wx.ALL | wx.CENTER)
         self.setting_to_control[st.GetLabelText()] = spinCtrl
@@ -3,9 +3,10 @@
 # Author: Roberto Buelvas
 
 from datetime import datetime
+from array import array
+from threading import Thread
 import time
 import math
-import os
 
 import numpy as np
 import wx
@@ -15,6 +16,8 @@ from .ports_dialog import PortsDialog, devices
 from .plot_notebook import Map, Plot, PlotNotebook
 from .layout_dialog import LayoutDialog
 from .cameras import CameraFrame
+from .file_names import nextFileNumber
+from .repeated_timer import RepeatedTimer
 
 
 class MainWindow(wx.Frame):
@@ -32,8 +35,17 @@ class MainWindow(wx.Frame):
         btn_start (wx.ToggleButton): Button to toggle start/stop reading every second
         btn_test (wx.ToggleButton): Button to toggle in and out of 'Test Mode'
         btn_measure (wx.Button): Button to take a single set of readings
-        logText (wx.TextCtrl): Control where information is logged
-        timer (wx.Timer): Object to call a function periodically
+        logText (wx.TextCtrl): Control where information is logged. It is a rich text
+            control so that positions count each newline as one character
+        log_position (int): Position where the text of logText ends
+        timer (RepeatedTimer): Object to take readings periodically in another thread.
+            None when not running
+        is_apply_pending (bool): Indicate if applyReadings has already been scheduled
+            but hasn't run yet. Used to avoid piling up calls when the UI is busy
+        connect_thread (threading.Thread): Thread running connectSensors(). None when
+            not connecting
+        portsmi (wx.MenuItem): Ports option of the toolbar. Disabled while connecting
+        layoutmi (wx.MenuItem): Layout option of the toolbar. Disabled while connecting
         sensor_handler (SensorHandler): Object to control multiple sensors at once
         camera_frame (CameraFrame): Secondary frame to display video from cameras
         mapPanel (Plot): Panel containing the Figure where the map is drawn
@@ -42,12 +54,26 @@ class MainWindow(wx.Frame):
             plots
         labels (list): List of all possible labels of the style mL1 or gR given
             the number of scaling sensors
-        last_record (list): List showing positions in the text log where each
+        last_record (array.array): Array showing positions in the text log where each
             set of measurements ends. Used to erase the last set of values from
             the log text
         num_readings (int): Stores how many sets of measurements have been taken
             in the current survey. Set back to 0 when log text is cleared or
             exported to file
+        sensor_ds (np.ndarray): Distance in m along the toolbar from the middle point
+            to each connected sensor other than GPS. Negative on the left
+        sensor_db (np.ndarray): Distance in m behind the toolbar of each connected
+            sensor other than GPS
+        sensor_colors (list<str>): Color of the marker of each sensor in sensor_ds
+        connected (dict): Keys are labels of the style mL1 or gR. Values are the
+            'connected' settings from the Ports dialog. Cached to avoid reading cfg
+            on every set of measurements
+        active_labels (tuple): Labels of the connected sensors, in the order of labels
+        num_sensors (int): Cached 'numSensors' setting from the Ports dialog
+        gps_offsets (dict): Keys are 'L' or 'R'. Values are (dgx, dgy) in m from each
+            GPS receiver to the middle of the toolbar, or None if not set in Layout
+        settings_text (str): Block of text listing all settings, added to the log
+            whenever a survey starts or the settings change
     """
 
     def __init__(self, *args, **kwargs):
@@ -58,14 +84,18 @@ class MainWindow(wx.Frame):
         self.labels = self.updateLabels()
         self.axes = {}
         self.reset()
+        self.updateConfigCache()
+        self.updateSensorOffsets()
+        self.log_position = 0
         self.initUI()
         self.sensor_handler = None
         self.updateSensorHandler()
         self.camera_frame = None
         self.updateCameraFrame()
         self.camera_frame.Bind(wx.EVT_CLOSE, self.OnCameraClose)
-        self.timer = wx.Timer(self, wx.Window.NewControlId())
-        self.Bind(wx.EVT_TIMER, self.OnUpdate, id=self.timer.GetId())
+        self.timer = None
+        self.is_apply_pending = False
+        self.connect_thread = None
         self.Bind(wx.EVT_CLOSE, self.OnClose)
 
     def initUI(self):
@@ -87,12 +117,12 @@ class MainWindow(wx.Frame):
         menubar.Append(fileMenu, "&File")
 
         settingsMenu = wx.Menu()
-        portsmi = wx.MenuItem(settingsMenu, wx.ID_PREFERENCES, "&Ports")
-        settingsMenu.Append(portsmi)
-        self.Bind(wx.EVT_MENU, self.OnPorts, portsmi)
-        layoutmi = wx.MenuItem(settingsMenu, wx.ID_ANY, "&Layout")
-        settingsMenu.Append(layoutmi)
-        self.Bind(wx.EVT_MENU, self.OnLayout, layoutmi)
+        self.portsmi = wx.MenuItem(settingsMenu, wx.ID_PREFERENCES, "&Ports")
+        settingsMenu.Append(self.portsmi)
+        self.Bind(wx.EVT_MENU, self.OnPorts, self.portsmi)
+        self.layoutmi = wx.MenuItem(settingsMenu, wx.ID_ANY, "&Layout")
+        settingsMenu.Append(self.layoutmi)
+        self.Bind(wx.EVT_MENU, self.OnLayout, self.layoutmi)
         clearmi = wx.MenuItem(settingsMenu, wx.ID_ANY, "&Clear")
         settingsMenu.Append(clearmi)
         self.Bind(wx.EVT_MENU, self.OnClear, clearmi)
@@ -125,7 +155,7 @@ class MainWindow(wx.Frame):
         self.mapPanel = Map(backgroundPanel)
         st2 = wx.StaticText(backgroundPanel, label="Log:")
         self.logText = wx.TextCtrl(
-            backgroundPanel, style=wx.TE_MULTILINE | wx.TE_READONLY
+            backgroundPanel, style=wx.TE_MULTILINE | wx.TE_READONLY | wx.TE_RICH2
         )
         self.logSettings()
         leftBox.Add(st1, proportion=0, flag=wx.ALL)
@@ -136,12 +166,15 @@ class MainWindow(wx.Frame):
         middleBox = wx.BoxSizer(wx.VERTICAL)
         st3 = wx.StaticText(backgroundPanel, label="Plot:")
         self.plotter = PlotNotebook(backgroundPanel)
-        num_sensors = self.cfg.ReadInt("numSensors", 1)
+        num_sensors = self.num_sensors
+        self.plotter.Freeze()
         for device_name in variables.keys():
             variable_names = variables[device_name]
             scaling = devices[device_name][1]
             for name in variable_names:
                 self.plotter.add(name, device_name, scaling, num_sensors)
+        self.plotter.showFirstPage()
+        self.plotter.Thaw()
 
         middleBox.Add(st3, proportion=0, flag=wx.ALL)
         middleBox.Add(self.plotter, proportion=7, flag=wx.EXPAND | wx.ALL, border=20)
@@ -177,7 +210,14 @@ class MainWindow(wx.Frame):
         """ Response to close event
         
         Make sure to disconnect from all sensors and camera before exiting
+        If still connecting, the GPS sensors stop waiting for their first fix
         """
+        if self.timer is not None:
+            self.timer.stop()
+        if self.connect_thread is not None:
+            self.sensor_handler.cancel()
+            self.connect_thread.join()
+            self.connect_thread = None
         self.sensor_handler.closeAll()
         self.camera_frame.close()
         self.DestroyLater()
@@ -193,27 +233,24 @@ class MainWindow(wx.Frame):
         dialogFlag = confirmDiag.ShowModal()
         if dialogFlag == wx.ID_YES:
             self.logText.SetValue("")
+            self.log_position = 0
             self.logSettings()
-            num_sensors = self.cfg.ReadInt("numSensors", 1)
-            self.plotter.reset(num_sensors)
+            self.plotter.reset(self.num_sensors)
             self.mapPanel.clear()
-            self.mapPanel.refresh([])
+            self.mapPanel.refresh()
             self.reset()
 
     def OnSave(self, e):
         """ Toolbar option to save and reset log """
-        rootName = "data/HTPPLogFile" + datetime.now().strftime("%Y-%m-%d") + "X"
-        i = 1
-        while os.path.isfile(rootName + str(i) + ".txt"):
-            i += 1
-        finalFilename = rootName + str(i) + ".txt"
+        prefix = "HTPPLogFile" + datetime.now().strftime("%Y-%m-%d") + "X"
+        finalFilename = "data/" + prefix + str(nextFileNumber("data", prefix)) + ".txt"
         self.logText.SaveFile(finalFilename)
         self.logText.SetValue("")
+        self.log_position = 0
         self.logSettings()
-        num_sensors = self.cfg.ReadInt("numSensors", 1)
-        self.plotter.reset(num_sensors)
+        self.plotter.reset(self.num_sensors)
         self.mapPanel.clear()
-        self.mapPanel.refresh([])
+        self.mapPanel.refresh()
         self.reset()
 
     def OnQuit(self, e):
@@ -256,8 +293,10 @@ class MainWindow(wx.Frame):
                     "connected" + label, results.ReadBool("connected" + label)
                 )
                 self.cfg.Write("port" + label, results.Read("port" + label))
+            self.updateConfigCache()
             self.updateSensorHandler()
             self.updateCameraFrame()
+            self.updateSensorOffsets()
             self.logSettings()
             self.plotter.reset(num_sensors)
         pDialog.Destroy()
@@ -267,13 +306,9 @@ class MainWindow(wx.Frame):
         lDialog = LayoutDialog(self, self.cfg)
         dialogFlag = lDialog.ShowModal()
         if dialogFlag == wx.ID_OK:
-            results = lDialog.getSettings()
-            settings_list = lDialog.getSettingsList()
-            for setting_key in settings_list:
-                if setting_key[0] == "D":
-                    self.cfg.WriteFloat(setting_key, results.ReadFloat(setting_key))
-                if setting_key[0] == "I":
-                    self.cfg.WriteInt(setting_key, results.ReadInt(setting_key))
+            # The dialog writes the values that changed straight into cfg
+            self.updateConfigCache()
+            self.updateSensorOffsets()
             self.logSettings()
         # TODO
         condition = False
@@ -303,20 +338,23 @@ class MainWindow(wx.Frame):
         )
         dialogFlag = confirmDiag.ShowModal()
         if dialogFlag == wx.ID_YES:
-            all_config_keys = []
-            more, value, index = self.cfg.GetFirstEntry()
-            while more:
-                all_config_keys.append(value)
-                more, value, index = self.cfg.GetNextEntry(index)
-            all_config_keys.remove("notEmpty")
-            for key in all_config_keys:
-                self.cfg.DeleteEntry(key)
+            # Deleting everything at once and writing the dummy entry again is
+            # simpler than deleting every other key one by one
+            self.cfg.DeleteAll()
+            self.cfg.WriteBool("notEmpty", True)
+            self.cfg.Flush()
+            self.labels = self.updateLabels()
+            self.updateConfigCache()
 
     def OnConnect(self, e):
         """ Toggle button action to connect/disconnect from sensors
 
         When in 'Test Mode', it simulates a first GPS reading to compute the projection
         constants
+        Otherwise, connecting runs in another thread because waiting for the first GPS
+        fix can take a while. Meanwhile Ports and Layout are disabled, because they
+        replace the sensors being connected. finishConnect() updates the buttons when
+        it ends
         Start and Measure buttons are only enabled if connected
         Test button is only enabled if disconnected 
         """
@@ -325,10 +363,8 @@ class MainWindow(wx.Frame):
         is_test_mode = self.btn_test.GetValue()
         if is_test_mode:
             if is_pressed:
-                for label in self.labels:
-                    if (label[0] == "g") and self.cfg.ReadBool(
-                        "connected" + label, False
-                    ):
+                for label in self.active_labels:
+                    if label[0] == "g":
                         reading = [-73.939830, 45.423804, 45, 1, 10]
                         self.sensor_handler.GPS_constants = setupGPSProjection(reading)
                 btn.SetLabelText("Disconnect")
@@ -336,19 +372,16 @@ class MainWindow(wx.Frame):
                 btn.SetLabelText("Connect")
         else:
             if is_pressed:
-                success = self.sensor_handler.openAll()
-                if success:
-                    btn.SetLabelText("Disconnect")
-                    self.btn_start.Enable(is_pressed)
-                    self.btn_measure.Enable(is_pressed)
-                    self.btn_test.Enable(not is_pressed)
-                else:
-                    wx.MessageBox(
-                        "At least one port has not been properly set up",
-                        "Empty port",
-                        wx.OK | wx.ICON_WARNING,
-                    )
-                    btn.SetValue(False)
+                btn.Disable()
+                btn.SetLabelText("Connecting")
+                self.btn_test.Disable()
+                self.portsmi.Enable(False)
+                self.layoutmi.Enable(False)
+                self.connect_thread = Thread(
+                    target=self.connectSensors, name="connect", daemon=True
+                )
+                self.connect_thread.start()
+                return
             else:
                 self.sensor_handler.closeAll()
                 btn.SetLabelText("Connect")
@@ -356,6 +389,37 @@ class MainWindow(wx.Frame):
         self.btn_measure.Enable(is_pressed)
         self.btn_test.Enable(not is_pressed)
 
+    def connectSensors(self):
+        """ Open all ports in a thread and report back to the GUI thread """
+        success = self.sensor_handler.openAll()
+        wx.CallAfter(self.finishConnect, success)
+
+    def finishConnect(self, success):
+        """ Update the buttons once connectSensors() is done
+
+        Nothing is done if OnClose() already waited for the thread
+        """
+        if self.connect_thread is None:
+            return
+        self.connect_thread.join()
+        self.connect_thread = None
+        self.portsmi.Enable(True)
+        self.layoutmi.Enable(True)
+        self.btn_connect.Enable()
+        if success:
+            self.btn_connect.SetLabelText("Disconnect")
+        else:
+            wx.MessageBox(
+                "At least one port has not been properly set up",
+                "Empty port",
+                wx.OK | wx.ICON_WARNING,
+            )
+            self.btn_connect.SetValue(False)
+            self.btn_connect.SetLabelText("Connect")
+        self.btn_start.Enable(success)
+        self.btn_measure.Enable(success)
+        self.btn_test.Enable(not success)
+
     def OnStart(self, e):
         """ Button action to take measurements periodically
 
@@ -365,10 +429,11 @@ class MainWindow(wx.Frame):
         btn = e.GetEventObject()
         is_pressed = btn.GetValue()
         if is_pressed:
-            self.timer.Start(300.0)
+            self.timer = RepeatedTimer(0.3, self.OnTimer, self.btn_test.GetValue())
             btn.SetLabelText("Stop")
         else:
-            self.timer.Stop()
+            self.timer.stop()
+            self.timer = None
             btn.SetLabelText("Start")
         self.btn_connect.Enable(not is_pressed)
         self.btn_measure.Enable(not is_pressed)
@@ -376,11 +441,11 @@ class MainWindow(wx.Frame):
 
     def OnErase(self, e):
         """ Button action to delete last measurement from log text """
-        if self.logText.GetValue() != "":
-            lastPosition = self.logText.GetLastPosition()
-            self.logText.Remove(self.last_record[-1], lastPosition)
+        if self.log_position > 0:
+            self.logText.Remove(self.last_record[-1], self.log_position)
+            self.log_position = self.last_record[-1]
             if len(self.last_record) > 1:
-                del self.last_record[-1]
+                self.last_record.pop()
 
     def OnUpdate(self, e):
         """ Updates UI by getting new sensor data
@@ -388,58 +453,85 @@ class MainWindow(wx.Frame):
         This is a general method that calls the more specific ones if necessary
         """
         is_test_mode = self.btn_test.GetValue()
-        self.last_record.append(self.logText.GetLastPosition())
-        self.logText.AppendText("*****" + str(self.num_readings) + "*****\n")
+        self.applyReadings(self.readAllSensors(is_test_mode))
+
+    def OnTimer(self, is_test_mode):
+        """ Take a set of readings periodically
+
+        Runs in the thread of the RepeatedTimer, so the UI is only updated later
+        through wx.CallAfter. If the previous set hasn't been applied yet, the tick is
+        skipped, so widgets and num_readings are only ever used by one set at a time
+        """
+        if self.is_apply_pending:
+            return
+        self.is_apply_pending = True
+        readings = self.readAllSensors(is_test_mode)
+        wx.CallAfter(self.applyReadings, readings)
+
+    def readAllSensors(self, is_test_mode):
+        """ Get new data from every sensor without touching the UI
+
+        Returns a list of (label, reading) tuples
+        """
+        readings = []
         if is_test_mode:
-            for label in self.labels:
-                if self.cfg.ReadBool("connected" + label, False):
-                    reading = self.sensor_handler.simulate(
-                        label, self.num_readings, self.cfg
-                    )
-                    if label[0] == "g":
-                        self.updateMap(reading, label)
-                    self.updateLog(reading, label)
-                    self.updatePlot(reading, label)
+            for label in self.active_labels:
+                reading = self.sensor_handler.simulate(
+                    label, self.num_readings, self.gps_offsets
+                )
+                readings.append((label, reading))
         else:
-            for label in self.labels:
-                reading = self.sensor_handler.read(label, self.num_readings, self.cfg)
+            for label in self.active_labels:
+                reading = self.sensor_handler.read(
+                    label, self.num_readings, self.gps_offsets
+                )
                 if reading is not None:
-                    if label[0] == "g":
-                        self.updateMap(reading, label)
-                    self.updateLog(reading, label)
-                    self.updatePlot(reading, label)
+                    readings.append((label, reading))
+        return readings
+
+    def applyReadings(self, readings):
+        """ Update log, map and plots with a set of readings from readAllSensors() """
+        self.last_record.append(self.log_position)
+        log_lines = ["*****" + str(self.num_readings) + "*****\n"]
+        ts = datetime.now().strftime("%H:%M:%S.%f")
+        for label, reading in readings:
+            if label[0] == "g":
+                self.updateMap(reading, label)
+            log_lines.append(self.updateLog(reading, label, ts))
+            self.updatePlot(reading, label)
+        # Each call to AppendText updates the control, so the whole set goes at once
+        self.appendLog("".join(log_lines))
+        # Draw once per set of readings, and only what changed
+        self.mapPanel.refresh()
+        self.plotter.refresh()
         self.num_readings += 1
+        self.is_apply_pending = False
+
+    def updateLog(self, some_value, label, ts):
+        """ Produce the line of the log text for new sensor data
 
-    def updateLog(self, some_value, label):
-        """ Update log text after receiving new sensor data """
-        if some_value is not None:
-            ts = datetime.now().strftime("%H:%M:%S.%f")
-            value_text = []
+        ts is the time of the set of readings, formatted once for all its lines
+        Returns an empty string if there is no data
+        """
+        if some_value is None:
+            return ""
+        else:
+            # tolist() converts to Python floats once, which are cheaper to round and
+            # format than numpy scalars
+            values = some_value.tolist()
             if label[0] == "g":
-                for value in some_value:
-                    value_text.append(str(value))
+                value_text = ",".join(map(str, values))
             else:
-                for value in some_value:
-                    value_text.append(str(np.round(value, 4)))
-            self.logText.AppendText(
-                (label + ";" + ts + ";" + ",".join(value_text) + "\n")
-            )
+                value_text = ",".join([str(round(value, 4)) for value in values])
+            return label + ";" + ts + ";" + value_text + "\n"
 
     def updatePlot(self, some_value, label):
         """ Updates plots after receiving new sensor data
 
-        Instead of appending new points to a pre-existing plot, everytime a new
-        point arrives, a new plot is created next to it. Because it is made to
-        match in color and style, it looks as if everything was connected.
-        However, because of this way of updating the plots, the legends need to
-        be created manually.
-        Besides creating new plots, this method updates the attribute
-        previous_measurements
+        Each value is stored in the PlotData of its variable. Only the plot of the
+        active tab is redrawn, reusing one line per sensor
         """
-        sensor_type = label[0]
-        measured_properties = variables[sensor_type]
-        for i, measured_property in enumerate(measured_properties):
-            self.plotter.update(some_value[i], label, measured_property)
+        self.plotter.updateSensor(some_value, label)
 
     def updateMap(self, some_value, label):
         """ Update map after receiving new sensor data
@@ -453,79 +545,140 @@ class MainWindow(wx.Frame):
         at least two measurements are required to compute the heading, which
         in turn is required to know how to orient the sensor markers
         """
-        if (self.num_readings > 0) and (not any(np.isnan(some_value[[2, 7, 8]]))):
+        if (self.num_readings > 0) and (not np.isnan(some_value[[2, 7, 8]]).any()):
             vehicle_x = some_value[7]
             vehicle_y = some_value[8]
             heading_radians = math.pi * some_value[2] / 180
-            line_list = []
-            line_list.append(self.mapPanel.ax.plot(vehicle_x, vehicle_y, "bs")[0])
-            for label in self.labels:
-                if (label[0] != "g") and self.cfg.ReadBool("connected" + label, False):
-                    if label[0] == "u":
-                        color = "y"
-                        db = self.cfg.ReadFloat("DB1") / 100
+            self.mapPanel.addPoint(vehicle_x, vehicle_y)
+            sin_heading = math.sin(heading_radians)
+            cos_heading = math.cos(heading_radians)
+            sensor_x = (
+                vehicle_x + self.sensor_ds * sin_heading - self.sensor_db * cos_heading
+            )
+            sensor_y = (
+                vehicle_y - self.sensor_ds * cos_heading - self.sensor_db * sin_heading
+            )
+            self.mapPanel.setSensors(sensor_x, sensor_y, self.sensor_colors)
+
+    def updateSensorOffsets(self):
+        """ Compute where each connected sensor is relative to the GPS antenna
+
+        Uses the Settings from the Layout dialog. The results only change when the
+        Ports or Layout dialogs are accepted, so they are computed once then instead
+        of for every GPS reading. ds is the distance along the toolbar and db the
+        distance behind it, both in m
+        """
+        ds_list = []
+        db_list = []
+        self.sensor_colors = []
+        for label in self.active_labels:
+            if label[0] != "g":
+                if label[0] == "u":
+                    color = "y"
+                    db = self.cfg.ReadFloat("DB1") / 100
+                else:
+                    color = "r"
+                    db = (self.cfg.ReadFloat("DB1") + self.cfg.ReadFloat("DB2")) / 100
+                if label[0] == "e":
+                    color = "g"
+                    index = self.cfg.ReadInt("IE" + label[1])
+                    accumulator = 0
+                    for i in range(index):
+                        accumulator += self.cfg.ReadFloat("D" + label[1] + str(i + 1))
+                    if label[1] == "L":
+                        ds = -1 * accumulator / 100
                     else:
-                        color = "r"
-                        db = (self.cfg.ReadFloat("DB1") + self.cfg.ReadFloat("DB2")) / 100
-                    if label[0] == "e":
-                        color = "g"
-                        index = self.cfg.ReadInt("IE" + label[1])
-                        accumulator = 0
-                        for i in range(index):
-                            accumulator += self.cfg.ReadFloat("D" + label[1] + str(i + 1))
-                        if label[1] == "L":
-                            ds = -1 * accumulator / 100
-                        else:
-                            ds = accumulator / 100
-                        ds += self.cfg.ReadFloat("DE" + label[1]) / 100
+                        ds = accumulator / 100
+                    ds += self.cfg.ReadFloat("DE" + label[1]) / 100
+                else:
+                    accumulator = 0
+                    for i in range(int(label[2])):
+                        accumulator += self.cfg.ReadFloat("D" + label[1] + str(i + 1))
+                    if label[1] == "L":
+                        ds = -1 * accumulator / 100
                     else:
-                        accumulator = 0
-                        for i in range(int(label[2])):
-                            accumulator += self.cfg.ReadFloat("D" + label[1] + str(i + 1))
-                        if label[1] == "L":
-                            ds = -1 * accumulator / 100
-                        else:
-                            ds = accumulator / 100
-                    sensor_x = (
-                        vehicle_x
-                        + ds * math.sin(heading_radians)
-                        - db * math.cos(heading_radians)
-                    )
-                    sensor_y = (
-                        vehicle_y
-                        - ds * math.cos(heading_radians)
-                        - db * math.sin(heading_radians)
-                    )
-                    # line_list.append(
-                    #     self.mapPanel.ax.plot(
-                    #         sensor_x,
-                    #         sensor_y,
-                    #         marker="P",
-                    #         color=color,
-                    #         markerfacecolor=color,
-                    #     )[0]
-                    # )
-            self.mapPanel.refresh(line_list)
-            line_list = []
+                        ds = accumulator / 100
+                ds_list.append(ds)
+                db_list.append(db)
+                self.sensor_colors.append(color)
+        self.sensor_ds = np.array(ds_list)
+        self.sensor_db = np.array(db_list)
+
+    def updateConfigCache(self):
+        """ Read the settings needed for every set of measurements
+
+        wx.Config is backed by a file and its keys are built by concatenating strings,
+        so these values are read once here. It needs to be called again whenever the
+        Ports, Layout or Clear options change the settings
+        The text with all settings for the log is also prepared here
+        """
+        self.num_sensors = self.cfg.ReadInt("numSensors", 1)
+        self.connected = {
+            label: self.cfg.ReadBool("connected" + label, False) for label in self.labels
+        }
+        self.active_labels = tuple(
+            label for label in self.labels if self.connected[label]
+        )
+        self.gps_offsets = {}
+        for side in ("L", "R"):
+            if self.cfg.HasEntry("DG" + side + "X") and self.cfg.HasEntry(
+                "DG" + side + "Y"
+            ):
+                self.gps_offsets[side] = (
+                    self.cfg.ReadFloat("DG" + side + "X") / 100,
+                    self.cfg.ReadFloat("DG" + side + "Y") / 100,
+                )
+            else:
+                self.gps_offsets[side] = None
+        self.settings_text = self.formatSettings()
 
-    def logSettings(self):
-        """ Append settings to log """
-        self.logText.AppendText("**************Settings-Start**************\n")
+    def getConfigKeys(self):
+        """ List the keys of all settings except the dummy entry 'notEmpty' """
+        keys = []
         more, value, index = self.cfg.GetFirstEntry()
         while more:
-            initial = value[0]
             if value != "notEmpty":
-                if (initial == "I") or (initial == "n"):
-                    property = str(self.cfg.ReadInt(value))
-                if initial == "D":
-                    property = str(self.cfg.ReadFloat(value))
-                if initial == "c":
-                    property = str(self.cfg.ReadBool(value))
-                if initial == "p":
-                    property = self.cfg.Read(value)
-                self.logText.AppendText("{" + value + ": " + property + "}\n")
+                keys.append(value)
             more, value, index = self.cfg.GetNextEntry(index)
-        self.logText.AppendText("**************Settings-End****************\n")
+        return keys
+
+    def logSettings(self):
+        """ Append settings to log
+
+        The text is built by updateConfigCache(), so it is only read from cfg when the
+        settings change and not every time a survey starts
+        """
+        self.appendLog(self.settings_text)
+
+    def appendLog(self, text):
+        """ Append text to the log and keep track of where it ends
+
+        Knowing the position avoids asking the control for it or for its whole text
+        The control is frozen meanwhile so that it is only repainted once
+        """
+        self.logText.Freeze()
+        try:
+            self.logText.AppendText(text)
+        finally:
+            self.logText.Thaw()
+        self.log_position += len(text)
+
+    def formatSettings(self):
+        """ Produce the block of text that lists all settings """
+        # The initial of each key tells its type
+        readers = {
+            "I": self.cfg.ReadInt,
+            "n": self.cfg.ReadInt,
+            "D": self.cfg.ReadFloat,
+            "c": self.cfg.ReadBool,
+            "p": self.cfg.Read,
+        }
+        log_lines = ["**************Settings-Start**************\n"]
+        for key in self.getConfigKeys():
+            property = str(readers.get(key[0], self.cfg.Read)(key))
+            log_lines.append("{" + key + ": " + property + "}\n")
+        log_lines.append("**************Settings-End****************\n")
+        return "".join(log_lines)
 
     def updateLabels(self):
         """ Produces list of sensor labels
@@ -556,10 +709,9 @@ class MainWindow(wx.Frame):
         if self.sensor_handler is not None:
             self.sensor_handler.closeAll()
         self.sensor_handler = SensorHandler()
-        for label in self.labels:
-            is_connected = self.cfg.ReadBool("connected" + label, False)
+        for label in self.active_labels:
             port = self.cfg.Read("port" + label, "")
-            if is_connected and (port != ""):
+            if port != "":
                 self.sensor_handler.add(port, label)
 
     def updateCameraFrame(self):
@@ -567,15 +719,22 @@ class MainWindow(wx.Frame):
         if self.camera_frame is not None:
             self.camera_frame.close()
         camera_ports = [None, None]
-        if self.cfg.ReadBool("connectedcL", False):
-            camera_ports[0] = int(self.cfg.Read("portcL", ""))
-        if self.cfg.ReadBool("connectedcR", False):
-            camera_ports[1] = int(self.cfg.Read("portcR", ""))
+        for i, side in enumerate(("L", "R")):
+            # The Ports dialog leaves the port empty when the camera is not connected,
+            # so the flag only needs to be read for settings saved before that
+            port = self.cfg.Read("portc" + side, "")
+            if (port != "") and self.cfg.ReadBool("connectedc" + side, False):
+                try:
+                    camera_ports[i] = int(port)
+                except ValueError:
+                    print("Invalid camera port " + port)
         self.camera_frame = CameraFrame(self, camera_ports)
         self.camera_frame.Show(self.camerami.IsChecked())
 
     def reset(self):
-        """ Reset the values of attributes any time a new survey starts """
-        self.labels = self.updateLabels()
+        """ Reset the values of attributes any time a new survey starts
+
+        labels is not rebuilt here because it only changes with the number of sensors
+        """
         self.num_readings = 0
-        self.last_record = [0]
+        self.last_record = array("l", [0])
@@ -2,6 +2,8 @@
 
 # Author: Roberto Buelvas
 
+from collections import deque
+
 from matplotlib.backends.backend_wxagg import FigureCanvasWxAgg as FigureCanvas
 from matplotlib.lines import Line2D
 import wx.lib.agw.aui as aui
@@ -18,9 +20,15 @@ class Map(wx.Panel):
         ax (mpl.axes.Axes): Axes inside figure
         canvas (FigureCanvasWxAgg): Canvas where the figure paints
         point_len (int): Maximum number of points to display at a time
-        lines (list<list<mpl.lines.Line2D>>): In each iteration, multiple lines are added:
-            some for the vehicle and some others for each sensor. This list of lists
-            keeps track of them to be able to delete them later
+        x_values (deque<float>): x coordinates of the last point_len vehicle positions
+        y_values (deque<float>): y coordinates of the last point_len vehicle positions
+        track (mpl.lines.Line2D): Single line whose markers show the vehicle
+            positions. Its data is replaced instead of adding a line per position
+        sensors (mpl.collections.PathCollection): Markers showing where the sensors
+            were at the last vehicle position
+        background (BufferRegion or None): Map without track and sensors, which are
+            animated and only drawn when blitting. None if it needs to be captured
+        is_dirty (bool): Indicate if there are new positions not drawn yet
     """
 
     def __init__(self, parent, id=-1, point_len=20, dpi=None, **kwargs):
@@ -40,48 +48,98 @@ class Map(wx.Panel):
         sizer = wx.BoxSizer(wx.VERTICAL)
         sizer.Add(self.canvas, 1, wx.EXPAND)
         self.SetSizer(sizer)
+        # Any full draw, e.g. after resizing, leaves a new background behind
+        self.canvas.mpl_connect("draw_event", self.OnDraw)
         self.clear()
 
-    def refresh(self, line_list):
+    def addPoint(self, x, y):
+        """ Add a new vehicle position, dropping the oldest one if needed
+
+        Nothing is drawn until refresh() is called
+        """
+        self.x_values.append(x)
+        self.y_values.append(y)
+        self.is_dirty = True
+
+    def setSensors(self, x, y, colors):
+        """ Move the sensor markers to new positions
+
+        Args:
+            x (np.ndarray): x coordinates of each sensor
+            y (np.ndarray): y coordinates of each sensor
+            colors (list<str>): Color of the marker of each sensor
+        Nothing is drawn until refresh() is called
+        """
+        self.sensors.set_offsets(np.column_stack((x, y)))
+        self.sensors.set_facecolor(colors)
+        self.is_dirty = True
+
+    def refresh(self):
         """ Tell the Plot to actually implement the latest
             modifications
 
-        line and old_line_list are emptied in the end to make sure no reference remains
-        to the line objects and the garbage collector actually removes them
+        Nothing is done if no position was added since the last call
+        Use canvas.blit() instead of drawing the whole figure. That is only needed
+        when the positions no longer fit in the limits of the Axes
 
         Documentation for this backend is kinda poor, but basically whenever
         something important needs to be done, it will only work if called from
         the FigureCanvas, not the Figure
         """
-        if line_list != []:
-            self.lines.append(line_list)
-        if len(self.lines) > self.point_len:
-            old_line_list = self.lines.pop(0)
-            for line in old_line_list:
-                self.ax.lines.remove(line)
-            line = None
-            old_line_list = []
-            self.updateLimits()
-        self.canvas.draw_idle()
+        if not self.is_dirty:
+            return
+        self.track.set_data(list(self.x_values), list(self.y_values))
+        self.is_dirty = False
+        if self.updateLimits() or (self.background is None):
+            # OnDraw() captures the new background and draws the markers
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self.drawArtists()
+        self.canvas.blit(self.ax.bbox)
+
+    def OnDraw(self, e):
+        """ Capture the background after a full draw and add the animated markers """
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.drawArtists()
+
+    def drawArtists(self):
+        """ Draw the markers of the vehicle and the sensors """
+        self.ax.draw_artist(self.track)
+        self.ax.draw_artist(self.sensors)
 
     def clear(self):
         """ Clear the Axes of the Figure """
-        self.lines = []
         self.figure.gca().cla()
+        self.x_values = deque(maxlen=self.point_len)
+        self.y_values = deque(maxlen=self.point_len)
+        self.track = self.ax.plot([], [], "bs", animated=True)[0]
+        self.sensors = self.ax.scatter([], [], marker="P", animated=True)
+        self.background = None
+        self.is_dirty = True
 
     def updateLimits(self):
-        """ Find the limits of the data to adjust axes """
-        x_values = []
-        y_values = []
-        for line_list in self.lines:
-            x_values.append(line_list[0].get_xdata()[0])
-            y_values.append(line_list[0].get_ydata()[0])
-        min_x = min(x_values) - 1
-        max_x = max(x_values) + 1
-        min_y = min(y_values) - 1
-        max_y = max(y_values) + 1
-        self.ax.set_xlim(min_x, max_x)
-        self.ax.set_ylim(min_y, max_y)
+        """ Adjust the limits of the axes if the data doesn't fit in them
+
+        The limits are set to the data with a margin of 1 m, so they don't change
+        while the vehicle moves inside them
+        Return True if the limits changed
+        """
+        if len(self.x_values) == 0:
+            return False
+        points = np.column_stack((self.x_values, self.y_values))
+        sensor_points = self.sensors.get_offsets()
+        if len(sensor_points) > 0:
+            points = np.concatenate((points, sensor_points))
+        low = points.min(axis=0)
+        high = points.max(axis=0)
+        left, right = self.ax.get_xlim()
+        bottom, top = self.ax.get_ylim()
+        if left <= low[0] and high[0] <= right and bottom <= low[1] and high[1] <= top:
+            return False
+        self.ax.set_xlim(low[0] - 1, high[0] + 1)
+        self.ax.set_ylim(low[1] - 1, high[1] + 1)
+        return True
 
 
 class Plot(wx.Panel):
@@ -92,7 +150,8 @@ class Plot(wx.Panel):
         x_len (int): Maximum number of points to display at a time
         background (BufferRegion): Empty background to leverage blitting
         lines (list<mpl.lines.Line2D>): Each sensor of the same type has a line in this
-            list. Used to update them later with different data
+            list. Used to update them later with different data. They are animated, so
+            they are left out of background and only drawn when blitting
     """
 
     def __init__(self, parent, x_len, id=-1, dpi=100, **kwargs):
@@ -116,35 +175,61 @@ class Plot(wx.Panel):
         """ Redefine lines attribute as response to change in notebook """
         self.clear()
         self.lines = []
+        x_values = range(self.x_len)
         for i in range(plot_data.data.shape[0]):
+            color = "C" + str(i)
             self.lines.append(
                 self.ax.plot(
-                    range(self.x_len),
+                    x_values,
                     plot_data.data[i, :],
                     marker="o",
-                    color="C" + str(i),
-                    markerfacecolor="C" + str(i),
+                    color=color,
+                    markerfacecolor=color,
+                    animated=True,
                 )[0]
             )
         self.redoLegend(plot_data)
+        self.updateLimits(plot_data.data)
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
 
     def refresh(self, plot_data):
         """ Tell the Plot to actually implement the latest
             modifications
 
-        Use canvas.blit() instead of canvas.draw_idle() to save time
+        Use canvas.blit() instead of canvas.draw_idle() to save time. The whole
+        figure is only drawn again when the data no longer fits in the y limits
 
         Documentation for this backend is kinda poor, but basically whenever
         something important needs to be done, it will only work if called from
         the FigureCanvas, not the Figure
         """
+        if self.updateLimits(plot_data.data):
+            self.canvas.draw()
+            self.background = self.canvas.copy_from_bbox(self.ax.bbox)
         self.canvas.restore_region(self.background)
         for line, data in zip(self.lines, plot_data.data):
             line.set_ydata(data)
-            self.ax.add_line(line)
             self.ax.draw_artist(line)
         self.canvas.blit(self.ax.bbox)
 
+    def updateLimits(self, data):
+        """ Widen the y limits if data doesn't fit in them
+
+        Missing readings are NaN, which matplotlib leaves as gaps in the lines.
+        Return True if the limits changed
+        """
+        if np.isnan(data).all():
+            return False
+        low = np.nanmin(data)
+        high = np.nanmax(data)
+        bottom, top = self.ax.get_ylim()
+        if bottom <= low and high <= top:
+            return False
+        margin = max(0.05 * (high - low), 0.5)
+        self.ax.set_ylim(low - margin, high + margin)
+        return True
+
     def clear(self):
         """ Function to clear the Axes of the Figure """
         self.ax.cla()
@@ -235,7 +320,9 @@ class PlotData:
         num_sensors (int): In case of scaling being True, the number of sensors of its
             type on each side of the vehicle
         data (np.ndarray): Array holding the latest x_len readings for a specific variable
-            for all sensors of its type
+            for all sensors of its type. Missing readings are NaN
+        rows (dict<str: int>): Keys are labels in the 'mL1' or 'gR' format. Values are
+            the row of data for that sensor, which is also the number of its color
     """
 
     def __init__(self, x_len, sensor_type, scaling, num_sensors):
@@ -247,28 +334,24 @@ class PlotData:
 
     def updateData(self, someValue, label):
         """ Update data attribute with a specific sensor reading """
-        if self.scaling:
-            index = int(label[2]) - 1
-            if label[1] == "R":
-                index += self.num_sensors
-        else:
-            if label[1] == "L":
-                index = 0
-            else:
-                index = 1
+        index = self.rows[label]
         self.data[index, :-1] = self.data[index, 1:]
-        if np.isnan(someValue):
-            self.data[index, -1] = -1
-        else:
-            self.data[index, -1] = someValue
+        self.data[index, -1] = someValue
 
     def reset(self, num_sensors):
         """ Reset data attribute """
         self.num_sensors = num_sensors
         if self.scaling:
-            self.data = -1 * np.ones((2 * self.num_sensors, self.x_len))
+            self.data = np.full((2 * self.num_sensors, self.x_len), np.nan)
+            labels = [
+                self.sensor_type + side + str(i + 1)
+                for side in ("L", "R")
+                for i in range(self.num_sensors)
+            ]
         else:
-            self.data = -1 * np.ones((2, self.x_len))
+            self.data = np.full((2, self.x_len), np.nan)
+            labels = [self.sensor_type + "L", self.sensor_type + "R"]
+        self.rows = {label: i for i, label in enumerate(labels)}
 
 
 class PlotNotebook(wx.Panel):
@@ -282,6 +365,12 @@ class PlotNotebook(wx.Panel):
         plot (Plot): Custom panel where plot is displayed
         plot_data (dict<str: PlotData>): Dict to hold all PlotData objects. Keys are the
             measured properties like "NDVI" or "Velocity"
+        is_dirty (bool): Indicate if the data of the active tab changed since it was
+            last drawn
+        sensor_plots (dict<str: list<PlotData>>): Keys are initials of the sensors,
+            like in the keys of variables dict. Values are the PlotData objects of the
+            variables they measure, in the same order as their readings
+        active_name (str): Name of the variable in the active tab
     """
 
     def __init__(self, parent, id=-1, x_len=20):
@@ -297,24 +386,51 @@ class PlotNotebook(wx.Panel):
         sizer.Add(self.plot, 1, wx.EXPAND)
         self.SetSizer(sizer)
         self.plot_data = {}
+        self.sensor_plots = {}
+        self.active_name = None
+        self.is_dirty = False
         self.Bind(aui.EVT_AUINOTEBOOK_PAGE_CHANGED, self.OnPageChange)
 
     def add(self, name, device_name, scaling, num_sensors):
-        """ Add plot in new tab """
+        """ Add plot in new tab
+
+        The tab is not selected, because every selection redraws the whole figure.
+        Call showFirstPage() once all tabs have been added
+        """
         page = wx.Panel(self)
         self.plot_data[name] = PlotData(self.x_len, device_name, scaling, num_sensors)
-        self.nb.AddPage(page, name, select=True)
+        self.sensor_plots.setdefault(device_name, []).append(self.plot_data[name])
+        self.nb.AddPage(page, name, select=False)
+
+    def showFirstPage(self):
+        """ Select the first tab and draw its plot """
+        self.nb.SetSelection(0)
+        self.active_name = self.nb.GetPageText(0)
+        self.plot.updateLines(self.plot_data[self.active_name])
+        self.plot.refresh(self.plot_data[self.active_name])
+
+    def updateSensor(self, some_value, label):
+        """ Modify the entries of every variable measured by a sensor
 
-    def update(self, some_value, label, measured_property):
-        """ Modify a specific entry of plot_data
-        
-        If it is the currently active page, also display the plot
+        The PlotData objects of each type of sensor are listed once in add(), so the
+        reading is matched to them without looking up each variable by name
         This is the function called by updatePlot in main_window
         """
-        page_name = self.nb.GetPageText(self.nb.GetSelection())
-        self.plot_data[measured_property].updateData(some_value, label)
-        if measured_property == page_name:
+        plots = self.sensor_plots[label[0]]
+        for plot_data, value in zip(plots, some_value):
+            plot_data.updateData(value, label)
+        if self.plot_data[self.active_name] in plots:
+            self.is_dirty = True
+
+    def refresh(self):
+        """ Draw the active plot if its data changed since it was last drawn
+
+        Called once after all readings of a set have been passed to updateSensor()
+        """
+        if self.is_dirty:
+            page_name = self.nb.GetPageText(self.nb.GetSelection())
             self.plot.refresh(self.plot_data[page_name])
+            self.is_dirty = False
 
     def reset(self, num_sensors):
         """ Reset data of all PlotData objects """
@@ -326,5 +442,6 @@ class PlotNotebook(wx.Panel):
     def OnPageChange(self, e):
         """ Response to change on pages in the TabControl """
         page_name = self.nb.GetPageText(self.nb.GetSelection())
+        self.active_name = page_name
         self.plot.updateLines(self.plot_data[page_name])
         self.plot.refresh(self.plot_data[page_name])
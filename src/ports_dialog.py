@@ -2,6 +2,7 @@
 
 # Author: Roberto Buelvas
 
+from concurrent.futures import ThreadPoolExecutor
 import glob
 import sys
 
@@ -117,7 +118,11 @@ class PortsDialog(wx.Dialog):
             chb = self.setting_to_checkbox[setting]
             self.settings.WriteBool("connected" + setting, chb.GetValue())
             cb = self.checkbox_to_combobox[chb]
-            self.settings.Write("port" + setting, cb.GetValue())
+            # An empty port also means that the sensor is not connected
+            if chb.GetValue():
+                self.settings.Write("port" + setting, cb.GetValue())
+            else:
+                self.settings.Write("port" + setting, "")
         self.EndModal(wx.ID_OK)
         # self.Destroy()
 
@@ -171,33 +176,45 @@ class PortsDialog(wx.Dialog):
         else:
             raise EnvironmentError("Unsupported platform")
 
-        result = []
-        for port in ports:
-            try:
-                s = serial.Serial(port)
-                s.close()
-                result.append(port)
-            except (OSError, serial.SerialException):
-                pass
-        return result
+        # Opening a missing port can block for a while, so all are probed at once
+        with ThreadPoolExecutor(max_workers=max(len(ports), 1)) as executor:
+            results = list(executor.map(self.probeSerialPort, ports))
+        return [port for port in results if port is not None]
+
+    def probeSerialPort(self, port):
+        """ Return port if it can be opened, None otherwise """
+        try:
+            s = serial.Serial(port)
+            s.close()
+            return port
+        except (OSError, serial.SerialException):
+            return None
 
     def getCameraPorts(self, initial_number=0, final_number=10):
         """ List camera ports names
         
         OpenCV doesn't receive a COM3 type of port, but a number
+        Opening a camera can take seconds when there is nothing connected, so all
+        ports are probed at the same time
         """
-        available_ports = []
-        for i in range(initial_number, final_number):
-            try:
-                cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-                ret, frame = cap.read()
-            except Exception as e:
-                pass
-            else:
-                cap.release()
-                if ret:
-                    available_ports.append(str(i))
-        return available_ports
+        with ThreadPoolExecutor(max_workers=final_number - initial_number) as executor:
+            results = list(
+                executor.map(self.probeCameraPort, range(initial_number, final_number))
+            )
+        return [port for port in results if port is not None]
+
+    def probeCameraPort(self, number):
+        """ Return number as str if a camera can be read from it, None otherwise """
+        try:
+            cap = cv2.VideoCapture(number, cv2.CAP_DSHOW)
+            ret, frame = cap.read()
+        except Exception as e:
+            return None
+        else:
+            cap.release()
+            if ret:
+                return str(number)
+            return None
 
     def addCheckComboBoxes(self, boxSizer, pnl, comboOptions, name, side, number=None):
         """ Add a combobox and a checkbox that controls if it is enabled
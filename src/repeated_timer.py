@@ -3,10 +3,17 @@
 # Author: Roberto Buelvas
 
 from threading import Timer
+import time
 
 
 class RepeatedTimer(object):
-    """ Class to create new thread """
+    """ Class to create new thread
+
+    Each call is scheduled from a deadline measured with time.perf_counter(), so the
+    delay of starting every new Timer doesn't accumulate as drift and changes to the
+    system clock don't affect the interval. If a deadline is missed by more than a whole
+    interval, the missed calls are skipped instead of run back to back
+    """
 
     def __init__(self, interval, function, *args, **kwargs):
         """ Create new object """
@@ -16,12 +23,17 @@ class RepeatedTimer(object):
         self.args = args
         self.kwargs = kwargs
         self.is_running = False
+        self.next_call = time.perf_counter()
         self.start()
 
     def start(self):
         """ Attach a timer if there is none already """
         if not self.is_running:
-            self._timer = Timer(self.interval, self._run)
+            now = time.perf_counter()
+            self.next_call += self.interval
+            if self.next_call < now:
+                self.next_call = now + self.interval
+            self._timer = Timer(self.next_call - now, self._run)
             self._timer.start()
             self.is_running = True
 
@@ -5,9 +5,10 @@ Cameras are not listed here because they are handled in cameras.py
 
 # Author: Roberto Buelvas
 
+from concurrent.futures import ThreadPoolExecutor
 from threading import Thread
-import random
 import math
+import time
 
 import numpy as np
 import pynmea2
@@ -166,7 +167,9 @@ def getGPSReading(line_reader, numValues=2):
                     values[count, 4] = parsedMessage.altitude
                     count += 1
         except Exception as e:
-            print(str(e))
+            # Partial or corrupted sentences are common and the loop just reads the
+            # next one. Printing each of them would slow down the reading thread
+            pass
     # Sometimes "Mean of empty slice" warning happens
     finalMeasurement = np.nanmean(values, axis=0)
     return finalMeasurement
@@ -378,12 +381,15 @@ class SensorHandler:
     Attr:
         sensors (dict): Keys are labels in the 'mL1' or 'gR' format. Values are
             SerialSensor objects
-        current_measurements (dict): Keys are labels in the 'mL1' or 'gR' format. Values
+        measurements (dict): Keys are labels in the 'mL1' or 'gR' format. Values
             are np.ndarray with the latest readings from each sensor
         previous_measurements (dict): Keys are labels in the 'mL1' or 'gR' format. Values
             are np.ndarray with the second to last readings from each sensor
         GPS_constants (list): Values used to project GPS reading to planar coordinates
             [origin_time, origin_longitude, origin_latitude, F_lon, F_lat]
+        rng (np.random.Generator): Source of the random numbers of simulate()
+        end_flag (bool): Flag to indicate when openAll() should stop waiting for the
+            first good GPS reading
     """
 
     def __init__(self):
@@ -392,6 +398,8 @@ class SensorHandler:
         self.measurements = {}
         self.previous_measurements = {}
         self.GPS_constants = None
+        self.rng = np.random.default_rng()
+        self.end_flag = False
 
     def add(self, port, label):
         """ Appends items to the sensors dict """
@@ -401,38 +409,59 @@ class SensorHandler:
     def openAll(self):
         """ Connects to all the sensors added so far 
 
-        If at some point it encounters an error, it will cancel the operation and
-        disconnect from the sensor that it had connected until that point.
+        All ports are opened at the same time, since each one can take a while and
+        GPS sensors also wait for their first good reading. If any of them fails, it
+        will disconnect from all the sensors.
         Returns True if operation was successful, False otherwise.      
         """
         labels = list(self.sensors.keys())
-        for i, label in enumerate(labels):
-            try:
-                success = self.sensors[label].open()
-                if label[0] == "g":
-                    self.setupGPS(label)
-            except Exception as e:
-                print(label)
-                print(str(e))
-                break
-            else:
-                if not success:
-                    print(label)
-                    break
-        # This condition would only be True if is_working was True for all devices
-        if self.sensors[labels[-1]].is_connected:
-            return True
-        else:
-            for j in range(i):
-                self.sensors[labels[j]].close()
+        if len(labels) == 0:
+            return False
+        with ThreadPoolExecutor(max_workers=len(labels)) as executor:
+            results = list(executor.map(self.openSensor, labels))
+        failed = [label for label, success in zip(labels, results) if not success]
+        if len(failed) > 0:
+            print("Could not connect to " + ", ".join(failed))
+            self.closeAll()
+            return False
+        return True
+
+    def openSensor(self, label):
+        """ Connect to one sensor and set up the GPS projection if needed
+
+        Returns True if the sensor ended up connected
+        """
+        try:
+            self.sensors[label].open()
+            if self.sensors[label].is_connected and (label[0] == "g"):
+                if not self.setupGPS(label):
+                    return False
+        except Exception as e:
+            print(label)
+            print(str(e))
             return False
+        return self.sensors[label].is_connected
+
+    def cancel(self):
+        """ Make openAll() stop waiting for GPS readings and fail
+
+        It can be called from any thread
+        """
+        self.end_flag = True
 
     def closeAll(self):
-        """ Disconnect from all sensors """
+        """ Disconnect from all sensors
+
+        Each thread can be blocked in a read for up to the timeout of its port, so all
+        of them are told to stop first. That way they finish at the same time instead
+        of one after another
+        """
+        for sensor in self.sensors.values():
+            sensor.end_flag = True
         for sensor in self.sensors.values():
             sensor.close()
 
-    def simulate(self, label, num_readings, cfg):
+    def simulate(self, label, num_readings, gps_offsets):
         """ Produces output that represents the readings of a sensor 
         
         For GPS, it simulates a predefined curve. For every other sensor, it produces
@@ -441,13 +470,12 @@ class SensorHandler:
             label (str): Label in 'mL1' or 'gR' format indicating which sensor to read
             num_readings(int): Number of readings performed so far. Only relevant for GPS
                 readings
-            cfg (wx.Config): Only relevant for GPS readings. Interface to config file of
-                the wx App. Contains values like distances between sensors used for
-                processing the GPS reading
+            gps_offsets (dict): Only relevant for GPS readings. Keys are 'L' or 'R'.
+                Values are (dgx, dgy) in m from the GPS receiver of that side to the
+                middle of the toolbar, or None if they haven't been set in Layout
         Return:
             reading (np.ndarray): Simulated reading from sensor
         """
-        self.previous_measurements = self.measurements.copy()
         if label[0] == "g":
             reading = [
                 -73.939830 + 0.0001 * num_readings,
@@ -460,19 +488,17 @@ class SensorHandler:
                 reading,
                 label,
                 self.GPS_constants,
-                self.previous_measurements,
+                self.measurements,
                 num_readings,
-                cfg,
+                gps_offsets[label[1]],
             )
+            reading = np.array(reading)
         else:
-            reading = []
-            for variable_name in variables[label[0]]:
-                reading.append(random.random())
-        for i, variable_name in enumerate(variables[label[0]]):
-            self.measurements[label + "/" + variable_name] = reading[i]
-        return np.array(reading)
-
-    def read(self, label, num_readings, cfg=None):
+            reading = self.rng.random(len(variables[label[0]]))
+        self.storeReading(label, reading)
+        return reading
+
+    def read(self, label, num_readings, gps_offsets=None):
         """ Produces the readings of a sensor 
         
         Args:
@@ -480,34 +506,39 @@ class SensorHandler:
                 If the label hasn't been added previously, the reading is None
             num_readings(int): Number of readings performed so far. Only relevant for GPS
                 readings
-            cfg (wx.Config): Only relevant for GPS readings. Interface to config file of
-                the wx App. Contains values like distances between sensors used for
-                processing the GPS reading
+            gps_offsets (dict): Only relevant for GPS readings. Keys are 'L' or 'R'.
+                Values are (dgx, dgy) in m from the GPS receiver of that side to the
+                middle of the toolbar, or None if they haven't been set in Layout
         Return:
             reading (np.ndarray): Reading from sensor
         """
-        self.previous_measurements = self.measurements.copy()
         if label in self.sensors.keys():
             reading = self.sensors[label].read()
             if label[0] == "g":
-                if cfg is not None:
+                if gps_offsets is not None:
                     reading = processGPS(
                         reading,
                         label,
                         self.GPS_constants,
-                        self.previous_measurements,
+                        self.measurements,
                         num_readings,
-                        cfg,
+                        gps_offsets[label[1]],
                     )
-                    for i, variable_name in enumerate(variables[label[0]]):
-                        self.measurements[label + "/" + variable_name] = reading[i]
+                    self.storeReading(label, reading)
             else:
-                for i, variable_name in enumerate(variables[label[0]]):
-                    self.measurements[label + "/" + variable_name] = reading[i]
+                self.storeReading(label, reading)
             return reading
         else:
             return None
 
+    def storeReading(self, label, reading):
+        """ Keep the reading of a sensor and move the one it replaces to previous
+
+        Only the entries of that sensor are touched, so nothing is copied
+        """
+        self.previous_measurements[label] = self.measurements.get(label)
+        self.measurements[label] = reading
+
     def hasLabel(self, label):
         """ Check if a specific sensor has been added before """
         return label in self.sensors.keys()
@@ -516,15 +547,23 @@ class SensorHandler:
         """ Produce GPS constants to convert to planar coordinates
         
         Before finding the values of the constants, it repeats reading from the sensor
-            until a 'good' reading happens i.e. no NaN values
+            until a 'good' reading happens i.e. no NaN in the longitude, latitude and
+            altitude used for the projection
+        Returns False if cancel() is called before that happens, True otherwise
         """
-        reading = np.array([np.nan, np.nan])
-        while True:
+        while not self.end_flag:
             reading = self.read(label, 0, None)
-            if reading is not None:
-                if not any(np.isnan(reading)):
-                    break
-        self.GPS_constants = setupGPSProjection(reading)
+            # NaN is the only value that is not equal to itself
+            if (
+                (reading is not None)
+                and (reading[0] == reading[0])
+                and (reading[1] == reading[1])
+                and (reading[4] == reading[4])
+            ):
+                self.GPS_constants = setupGPSProjection(reading)
+                return True
+            time.sleep(0.05)
+        return False
 
 
 # Other functions
@@ -547,14 +586,20 @@ def setupGPSProjection(reading):
     return [origin_longitude, origin_latitude, F_lon, F_lat]
 
 
-def processGPS(someValue, label, GPS_constants, previous_measurements, num_readings, cfg):
+def processGPS(
+    someValue, label, GPS_constants, previous_measurements, num_readings, gps_offset
+):
     """ Estimates heading and velocity from GPS readings
 
     Project the measurements to planar coordinates and use the immediately previous
     measurement to estimate heading and velocity
     The reported X and Y values are of the vehicle defined as the middle
     point of the toolbar that holds the sensors
+    gps_offset is the (dgx, dgy) pair in m of the GPS receiver, or None if it hasn't
+    been set in Layout
     """
+    if gps_offset is None:
+        return None
     origin_longitude = GPS_constants[0]
     origin_latitude = GPS_constants[1]
     F_lon = GPS_constants[2]
@@ -564,26 +609,21 @@ def processGPS(someValue, label, GPS_constants, previous_measurements, num_readi
     gps_x = (new_longitude - origin_longitude) * F_lon
     gps_y = (new_latitude - origin_latitude) * F_lat
     heading_radians = math.pi * someValue[2] / 180
-    if (label[1] == "L") and cfg.HasEntry("DGLX") and cfg.HasEntry("DGLY"):
-        dgx = cfg.ReadFloat("DGLX") / 100
-        dgy = cfg.ReadFloat("DGLY") / 100
+    dgx, dgy = gps_offset
+    if label[1] == "L":
         vehicle_x = (
             gps_x + dgx * math.sin(heading_radians) - dgy * math.cos(heading_radians)
         )
         vehicle_y = (
             gps_y - dgx * math.cos(heading_radians) - dgy * math.sin(heading_radians)
         )
-    elif (label[1] == "R") and cfg.HasEntry("DGRX") and cfg.HasEntry("DGRY"):
-        dgx = cfg.ReadFloat("DGRX") / 100
-        dgy = cfg.ReadFloat("DGRY") / 100
+    else:
         vehicle_x = (
             gps_x - dgx * math.sin(heading_radians) - dgy * math.cos(heading_radians)
         )
         vehicle_y = (
             gps_y + dgx * math.cos(heading_radians) - dgy * math.sin(heading_radians)
         )
-    else:
-        return None
     return np.append(someValue, [gps_x, gps_y, vehicle_x, vehicle_y])
 
 
@@ -0,0 +1,200 @@
+""" Define how camera frames are encoded into video files """
+
+# Author: Roberto Buelvas
+
+import os
+
+import cv2
+import numpy as np
+
+try:
+    import av
+except ImportError:
+    av = None
+
+try:
+    import PyNvVideoCodec as nvc
+except ImportError:
+    nvc = None
+
+# Encoders tried by PyAVWriter, from fastest to slowest. Each entry is
+# (codec name, pixel format, options)
+PYAV_CODECS = [
+    ("h264_nvenc", "yuv420p", {"preset": "p4", "tune": "ull"}),
+    ("h264_qsv", "nv12", {"preset": "veryfast"}),
+    ("h264_amf", "yuv420p", {"usage": "ultralowlatency"}),
+    ("libx264", "yuv420p", {"preset": "ultrafast", "tune": "zerolatency"}),
+]
+
+
+class NvencWriter:
+    """ Encode frames as H.264 using the NVENC chip of an NVIDIA GPU
+
+    It mimics the write() and release() methods of cv2.VideoWriter so that
+    CameraHandler can use either of them. The output is a raw H.264 stream, which
+    players like VLC or ffmpeg can read directly. NVENC has no BGR input, so frames
+    are given an alpha channel on the CPU and converted to YUV on the GPU
+
+    Attr:
+        file_out (file stream): Binary file where the bitstream is saved
+        encoder (nvc.PyNvEncoder): Hardware encoder from nvc.CreateEncoder() fed from RAM
+        bgra (np.ndarray): Buffer reused to hold frames in the ARGB format of NVENC,
+            which is stored as B, G, R, A bytes
+    """
+
+    extension = ".h264"
+
+    def __init__(self, filename, fps, width, height, gpu_id=0):
+        """ Create encoder and open output file
+
+        Raises RuntimeError if there is no CUDA device available
+        """
+        self.encoder = nvc.CreateEncoder(
+            width,
+            height,
+            "ARGB",
+            True,
+            codec="h264",
+            preset="P4",
+            tuning_info="ultra_low_latency",
+            fps=fps,
+            bf=0,
+            gpu_id=gpu_id,
+        )
+        self.bgra = np.empty((height, width, 4), dtype=np.uint8)
+        self.file_out = open(filename, "wb")
+
+    def write(self, frame):
+        """ Encode a BGR frame and save the resulting bytes, if any """
+        cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=self.bgra)
+        bitstream = self.encoder.Encode(self.bgra)
+        if len(bitstream) > 0:
+            self.file_out.write(bytearray(bitstream))
+
+    def release(self):
+        """ Flush frames still inside the encoder and close file """
+        bitstream = self.encoder.EndEncode()
+        if len(bitstream) > 0:
+            self.file_out.write(bytearray(bitstream))
+        self.file_out.close()
+
+
+class PyAVWriter:
+    """ Encode frames as H.264 into an MP4 file using the FFmpeg libraries of PyAV
+
+    The encoders of PYAV_CODECS are tried in order, so hardware encoders from NVIDIA,
+    Intel or AMD are used when present and libx264 otherwise. It mimics the write()
+    and release() methods of cv2.VideoWriter
+
+    Attr:
+        container (av.container.OutputContainer): MP4 file being written
+        stream (av.video.stream.VideoStream): Video stream inside container
+        codec_name (str): Name of the encoder that was selected
+    """
+
+    extension = ".mp4"
+
+    def __init__(self, filename, fps, width, height):
+        """ Open output file with the first encoder that works
+
+        Raises an exception if none of them is available
+        """
+        for codec_name, pix_fmt, options in PYAV_CODECS:
+            # Skip encoders not built into this FFmpeg without creating a container
+            try:
+                av.Codec(codec_name, "w")
+            except ValueError:
+                continue
+            self.container = av.open(filename, "w")
+            try:
+                self.stream = self.openStream(codec_name, pix_fmt, options, fps)
+                self.stream.width = width
+                self.stream.height = height
+                # Hardware encoders are only checked when the encoder is opened
+                self.stream.codec_context.open()
+                self.codec_name = codec_name
+                return
+            except (ValueError, av.error.FFmpegError):
+                self.container.close()
+                # The file is only created once encoding starts, so it may not exist
+                if os.path.exists(filename):
+                    os.remove(filename)
+        raise RuntimeError("No H.264 encoder available in PyAV")
+
+    def openStream(self, codec_name, pix_fmt, options, fps):
+        """ Add video stream to container with the given encoder settings """
+        stream = self.container.add_stream(codec_name, rate=fps)
+        stream.pix_fmt = pix_fmt
+        stream.options = options
+        if codec_name == "libx264":
+            stream.thread_count = os.cpu_count()
+        return stream
+
+    def write(self, frame):
+        """ Encode a BGR frame and save the resulting packets, if any """
+        video_frame = av.VideoFrame.from_ndarray(frame, format="bgr24")
+        for packet in self.stream.encode(video_frame):
+            self.container.mux(packet)
+
+    def release(self):
+        """ Flush frames still inside the encoder and close file """
+        for packet in self.stream.encode():
+            self.container.mux(packet)
+        self.container.close()
+
+
+def createVideoWriter(root_name, fps, width, height):
+    """ Create the fastest video writer available
+
+    Args:
+        root_name (str): Path of the output file without extension
+        fps (float): Frames per second of the video
+        width (int): Width in pixels of the frames
+        height (int): Height in pixels of the frames
+    Return:
+        video_out (PyAVWriter, NvencWriter or cv2.VideoWriter): Object with write()
+            and release() methods. PyAV is preferred because it writes MP4 files with
+            the best H.264 encoder available. Then NVENC is used when PyNvVideoCodec
+            and a CUDA device are available. Otherwise, OpenCV is used, with an
+            accelerated H.264 encoder of FFmpeg if possible and mp4v if not
+    """
+    if av is not None:
+        try:
+            return PyAVWriter(root_name + PyAVWriter.extension, fps, width, height)
+        except (OSError, RuntimeError) as e:
+            if nvc is not None:
+                print("PyAV unavailable, trying NVENC")
+            else:
+                print("PyAV unavailable, trying OpenCV H.264")
+            print(str(e))
+    if nvc is not None:
+        try:
+            return NvencWriter(root_name + NvencWriter.extension, fps, width, height)
+        except (OSError, RuntimeError) as e:
+            print("NVENC unavailable, trying OpenCV H.264")
+            print(str(e))
+    video_out = createOpenCVH264Writer(root_name + ".mp4", fps, width, height)
+    if video_out is not None:
+        return video_out
+    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+    return cv2.VideoWriter(root_name + ".mp4", fourcc, fps, (width, height))
+
+
+def createOpenCVH264Writer(filename, fps, width, height):
+    """ Create a cv2.VideoWriter using H.264 through FFmpeg with hardware acceleration
+
+    Return None if this version of OpenCV can't request hardware acceleration or if
+    the writer can't be opened
+    """
+    if not hasattr(cv2, "VIDEOWRITER_PROP_HW_ACCELERATION"):
+        return None
+    params = [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    fourcc = cv2.VideoWriter_fourcc(*"avc1")
+    video_out = cv2.VideoWriter(
+        filename, cv2.CAP_FFMPEG, fourcc, fps, (width, height), params
+    )
+    if video_out.isOpened():
+        return video_out
+    print("Accelerated H.264 unavailable in OpenCV, using mp4v")
+    video_out.release()
+    return None